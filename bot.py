@@ -5,7 +5,14 @@ from aiohttp import web
 from route import web_server, ping_server, check_expired_premium, start_scheduler 
 import pytz
 from datetime import date, datetime
-from utils import temp 
+from utils import temp, delete_queue_worker
+from database.users_db import db
+from database.indexes import ensure_indexes
+from database.stats import stats_service
+from plugins.index import start_index_worker
+from plugins.broadcast import start_broadcast_worker
+from plugins.ban_manager import ban_manager
+from plugins.post_channel import catch_up_channels
 
 class Bot(Client):
     def __init__(self):
@@ -50,6 +57,15 @@ class Bot(Client):
         time = now.strftime("%H:%M:%S %p")
         
         # --- BACKGROUND TASKS ---
+        self.loop.create_task(ensure_indexes(self))
+        start_index_worker(self)
+        start_broadcast_worker(self)
+        self.loop.create_task(catch_up_channels(self))
+        self.loop.create_task(db.video_catalog.migrate_history())
+        self.loop.create_task(db.brazzers_catalog.migrate_history())
+        self.loop.create_task(stats_service.run())
+        self.loop.create_task(delete_queue_worker(self))
+        self.loop.create_task(ban_manager.sweep())
         self.loop.create_task(check_expired_premium(self))
         self.loop.create_task(start_scheduler(self))
         
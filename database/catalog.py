@@ -0,0 +1,368 @@
+import zlib
+import random
+import hashlib
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from bson.binary import Binary
+from pymongo import ReturnDocument, UpdateOne
+from info import CATALOG_CACHE_USERS
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+
+# -------------------- BITMAP HELPERS --------------------
+def encode_bitmap(bits: int) -> Binary:
+    """Seen bitset (bit N = video seq N) -> zlib compressed BSON Binary."""
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return Binary(zlib.compress(raw))
+
+def decode_bitmap(data) -> int:
+    if not data:
+        return 0
+    return int.from_bytes(zlib.decompress(bytes(data)), "little")
+
+
+# -------------------- SHUFFLE PERMUTATION --------------------
+def shuffle_key(user_id, epoch) -> bytes:
+    return hashlib.blake2b(f"{user_id}:{epoch}".encode(), digest_size=16).digest()
+
+def shuffle_index(pos: int, size: int, key: bytes) -> int:
+    """
+    Map position `pos` in [0, size) to its slot in a keyed pseudo-random
+    permutation of [0, size). 4-round Feistel network + cycle walking, so
+    nothing but (key, pos) is needed to walk the permutation.
+    """
+    half = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    x = pos
+    while True:
+        left, right = x >> half, x & mask
+        for rnd in range(4):
+            digest = hashlib.blake2b(f"{rnd}:{right}".encode(), key=key, digest_size=8).digest()
+            left, right = right, left ^ (int.from_bytes(digest, "little") & mask)
+        x = (left << half) | right
+        if x < size:
+            return x
+
+
+# -------------------- SEQUENCE COUNTER --------------------
+async def next_seq(counters, name, count=1):
+    """Reserve `count` consecutive sequence numbers, returns the first one."""
+    doc = await counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["seq"] - count + 1
+
+
+# -------------------- VIDEO CATALOG --------------------
+class VideoCatalog:
+    """
+    In-process copy of a video collection.
+
+    Every video carries a stable `seq` number and every user's history is a
+    bitset of seen seqs, stored compressed in the history collection. Unseen
+    picks are done in memory, so MongoDB never sees a `$nin` list.
+    """
+
+    def __init__(self, collection, history, counters, cursors):
+        self.collection = collection
+        self.history = history
+        self.counters = counters
+        self.cursors = cursors
+        self.file_ids = {}             # seq -> file_id
+        self.seqs = {}                 # file_id -> seq
+        self.seq_list = []             # all seqs, for random probes
+        self.present = 0               # bitset of seqs in the catalog
+        self.max_seq = 0
+        self.seen_cache = OrderedDict()  # user_id -> int bitset (LRU)
+        self._user_locks = {}          # user_id -> [Lock, users], only while in use
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.seq_list)
+
+    # ---------- LOADING ----------
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+
+    async def load(self, force=False):
+        """Load the whole collection once (only seq + file_id are kept in RAM)."""
+        async with self._lock:
+            if self.loaded and not force:
+                return
+            await self._backfill_seq()
+            await self._backfill_rnd()
+
+            self.clear()
+            cursor = self.collection.find({}, {"seq": 1, "file_id": 1, "_id": 0})
+            async for doc in cursor:
+                seq = doc.get("seq")
+                file_id = doc.get("file_id")
+                if seq and file_id:
+                    self._add(seq, file_id)
+
+            self.loaded = True
+            logger.info(f"📚 Catalog loaded: {len(self.seq_list)} videos from {self.collection.name}")
+
+    async def _backfill_seq(self):
+        """Give a seq number to every old document that was indexed without one."""
+        missing = await self.collection.find(
+            {"seq": {"$exists": False}}, {"_id": 1}
+        ).sort("_id", 1).to_list(length=None)
+        if not missing:
+            return
+
+        first = await next_seq(self.counters, self.collection.name, len(missing))
+        ops = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"seq": first + i}})
+            for i, doc in enumerate(missing)
+        ]
+        for i in range(0, len(ops), 1000):
+            await self.collection.bulk_write(ops[i:i + 1000], ordered=False)
+        logger.info(f"🔢 Assigned seq to {len(missing)} old videos in {self.collection.name}")
+
+    async def _backfill_rnd(self):
+        """Give the indexed random sampling key to old documents."""
+        missing = await self.collection.find(
+            {"rnd": {"$exists": False}}, {"_id": 1}
+        ).to_list(length=None)
+        if not missing:
+            return
+
+        ops = [UpdateOne({"_id": doc["_id"]}, {"$set": {"rnd": random.random()}}) for doc in missing]
+        for i in range(0, len(ops), 1000):
+            await self.collection.bulk_write(ops[i:i + 1000], ordered=False)
+        logger.info(f"🎲 Assigned rnd key to {len(missing)} old videos in {self.collection.name}")
+
+    async def random_file_id(self):
+        """
+        Random video via the indexed `rnd` key: one `$gte` lookup on a fresh
+        random number, wrapping around to the smallest key if nothing is above.
+        """
+        r = random.random()
+        doc = await self.collection.find_one(
+            {"rnd": {"$gte": r}}, {"file_id": 1, "_id": 0}, sort=[("rnd", 1)]
+        )
+        if not doc:
+            doc = await self.collection.find_one(
+                {"rnd": {"$lt": r}}, {"file_id": 1, "_id": 0}, sort=[("rnd", 1)]
+            )
+        return doc["file_id"] if doc else None
+
+    def _add(self, seq, file_id):
+        if seq in self.file_ids:
+            return
+        self.file_ids[seq] = file_id
+        self.seqs[file_id] = seq
+        self.seq_list.append(seq)
+        self.present |= 1 << seq
+        self.max_seq = max(self.max_seq, seq)
+
+    def add(self, seq, file_id):
+        """Register a newly indexed video."""
+        self._add(seq, file_id)
+
+    def clear(self):
+        self.file_ids = {}
+        self.seqs = {}
+        self.seq_list = []
+        self.present = 0
+        self.max_seq = 0
+        self.seen_cache.clear()
+
+    # ---------- PER-USER SEEN BITSET ----------
+    async def _get_seen(self, user_id):
+        bits = self.seen_cache.get(user_id)
+        if bits is not None:
+            self.seen_cache.move_to_end(user_id)
+            return bits
+        # Cache miss: load under the user's lock, so a mark_seen saving a newer
+        # bitmap meanwhile can't be overwritten in the cache by this read
+        async with self._user_lock(user_id):
+            return await self._get_seen_locked(user_id)
+
+    async def _get_seen_locked(self, user_id):
+        """_get_seen for callers already holding _user_lock(user_id)."""
+        bits = self.seen_cache.get(user_id)
+        if bits is not None:
+            self.seen_cache.move_to_end(user_id)
+            return bits
+
+        doc = await self.history.find_one({"user_id": user_id}, {"_id": 0})
+        if doc and "seen" in doc:
+            # Old format (list of file_ids) -> migrate on first touch
+            bits = await self._migrate_doc(doc)
+        else:
+            bits = decode_bitmap((doc or {}).get("bitmap"))
+
+        self._remember(user_id, bits)
+        return bits
+
+    def _remember(self, user_id, bits):
+        self.seen_cache[user_id] = bits
+        self.seen_cache.move_to_end(user_id)
+        while len(self.seen_cache) > CATALOG_CACHE_USERS:
+            self.seen_cache.popitem(last=False)
+
+    async def _save(self, user_id, bits):
+        await self.history.update_one(
+            {"user_id": user_id},
+            {"$set": {"bitmap": encode_bitmap(bits)}, "$unset": {"seen": ""}},
+            upsert=True
+        )
+
+    @asynccontextmanager
+    async def _user_lock(self, user_id):
+        """
+        The bitmap is saved whole (it is zlib compressed, so MongoDB can't OR
+        a bit into it): read-modify-save of one user must not interleave.
+        """
+        entry = self._user_locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user_id]
+
+    async def mark_seen(self, user_id, file_id):
+        await self.ensure_loaded()
+        seq = self.seqs.get(file_id)
+        if seq is None:
+            return
+        async with self._user_lock(user_id):
+            bits = await self._get_seen_locked(user_id) | (1 << seq)
+            self._remember(user_id, bits)
+            await self._save(user_id, bits)
+
+    async def reset_user(self, user_id):
+        async with self._user_lock(user_id):
+            self._remember(user_id, 0)
+            await self._save(user_id, 0)
+
+    # ---------- MIGRATION (file_id lists -> bitmap) ----------
+    async def _migrate_doc(self, doc):
+        bits = decode_bitmap(doc.get("bitmap"))
+        for file_id in doc.get("seen", []):
+            seq = self.seqs.get(file_id)
+            if seq is not None:
+                bits |= 1 << seq
+        await self._save(doc["user_id"], bits)
+        return bits
+
+    async def migrate_history(self, pause=0.05):
+        """Convert every old-format history document in the background."""
+        await self.ensure_loaded()
+        migrated = 0
+        cursor = self.history.find({"seen": {"$exists": True}})
+        async for doc in cursor:
+            user_id = doc.get("user_id")
+            try:
+                async with self._user_lock(user_id):
+                    # Re-read under the lock: a delivery may have migrated it meanwhile
+                    doc = await self.history.find_one({"user_id": user_id, "seen": {"$exists": True}})
+                    if not doc:
+                        continue
+                    bits = await self._migrate_doc(doc)
+                    if user_id in self.seen_cache:
+                        self._remember(user_id, bits)
+                migrated += 1
+            except Exception as e:
+                logger.error(f"History migration failed for {user_id}: {e}")
+            if migrated % 100 == 0:
+                await asyncio.sleep(pause)
+        if migrated:
+            logger.info(f"🗜 Migrated {migrated} history documents in {self.history.name}")
+
+    # ---------- PICKING ----------
+    async def pick_unseen(self, user_id):
+        """Return a random unseen file_id for the user, or None if all are seen."""
+        await self.ensure_loaded()
+        if not self.seq_list:
+            return None
+
+        seen = await self._get_seen(user_id)
+
+        # Fast path: a few random probes hit an unseen video almost always
+        for _ in range(8):
+            seq = random.choice(self.seq_list)
+            if not (seen >> seq) & 1:
+                return self.file_ids[seq]
+
+        # Slow path (user has seen most of the catalog): pick the k-th free bit
+        free = self.present & ~seen
+        unseen = free.bit_count()
+        if not unseen:
+            return None
+        k = random.randrange(unseen)
+        for index, byte in enumerate(free.to_bytes((free.bit_length() + 7) // 8, "little")):
+            count = byte.bit_count()
+            if k >= count:
+                k -= count
+                continue
+            for bit in range(8):
+                if (byte >> bit) & 1:
+                    if k == 0:
+                        return self.file_ids[index * 8 + bit]
+                    k -= 1
+        return None
+
+    # ---------- SHUFFLE CURSOR MODE ----------
+    async def pick_shuffled(self, user_id):
+        """
+        Walk the user's own permutation of the catalog. The only state is a
+        cursor doc {epoch, pos, size}: `size` is the catalog's max seq when
+        the epoch started, videos added later are served after the shuffle
+        in upload order.
+        """
+        await self.ensure_loaded()
+        kind = self.collection.name
+
+        # Bounded, skips seq gaps left by removed videos
+        for _ in range(64):
+            doc = await self.cursors.find_one_and_update(
+                {"user_id": user_id, "kind": kind, "pos": {"$lt": self.max_seq}},
+                {"$inc": {"pos": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                # Either no cursor yet, or the whole catalog has been walked
+                result = await self.cursors.update_one(
+                    {"user_id": user_id, "kind": kind},
+                    {"$setOnInsert": {"epoch": 0, "pos": 0, "size": self.max_seq}},
+                    upsert=True
+                )
+                if result.upserted_id is None:
+                    return None
+                continue
+
+            pos = doc["pos"] - 1
+            size = min(doc.get("size", 0), self.max_seq)
+            if pos < size:
+                seq = shuffle_index(pos, size, shuffle_key(user_id, doc.get("epoch", 0))) + 1
+            else:
+                seq = pos + 1
+
+            file_id = self.file_ids.get(seq)
+            if file_id:
+                return file_id
+        return None
+
+    async def reset_shuffle(self, user_id):
+        """Start a new epoch -> a brand new permutation from position 0."""
+        await self.ensure_loaded()
+        await self.cursors.update_one(
+            {"user_id": user_id, "kind": self.collection.name},
+            {"$inc": {"epoch": 1}, "$set": {"pos": 0, "size": self.max_seq}},
+            upsert=True
+        )
@@ -0,0 +1,199 @@
+import time
+import logging
+from datetime import datetime, timezone
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from database.users_db import db
+from database.catalog import encode_bitmap, decode_bitmap
+from info import LOG_CHANNEL, USAGE_RETENTION_DAYS
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+
+def _index(keys, **kwargs):
+    if isinstance(keys, str):
+        keys = [(keys, ASCENDING)]
+    return IndexModel(keys, **kwargs)
+
+# collection -> indexes it needs.
+# Unique indexes are built only after duplicates on that key are merged.
+INDEX_PLAN = [
+    (db.users, [
+        _index("id", unique=True, name="id_unique"),
+        _index("expiry_time", name="expiry_time"),
+        _index("last_date", name="last_date"),
+    ]),
+    (db.videos, [
+        _index("file_unique_id", unique=True, name="file_unique_id_unique"),
+        _index("seq", name="seq"),
+        _index("rnd", name="rnd"),
+    ]),
+    (db.brazzers, [
+        _index("file_unique_id", unique=True, name="file_unique_id_unique"),
+        _index("seq", name="seq"),
+        _index("rnd", name="rnd"),
+    ]),
+    (db.historys, [_index("user_id", unique=True, name="user_id_unique")]),
+    (db.braz_history, [_index("user_id", unique=True, name="user_id_unique")]),
+    (db.codes, [_index("code_hash", unique=True, name="code_hash_unique")]),
+    (db.verify_id, [_index([("user_id", ASCENDING), ("hash", ASCENDING)], name="user_id_hash")]),
+    (db.blocked_users, [_index("user_id", unique=True, name="user_id_unique")]),
+    (db.misc, [
+        _index("user_id", unique=True, name="user_id_unique"),
+        _index("last_verified", name="last_verified"),
+    ]),
+    (db.refer_collection, [_index("user_id", unique=True, name="user_id_unique")]),
+    (db.index_jobs, [_index([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at")]),
+    (db.delete_queue, [_index("due_at", name="due_at")]),
+    (db.deleted_users, [_index("id", name="id"), _index("deleted_at", name="deleted_at")]),
+    (db.broadcast_jobs, [_index([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at")]),
+    (db.usage_daily, [
+        _index([("user_id", ASCENDING), ("day", ASCENDING)], unique=True, name="user_id_day_unique"),
+        _index("day", expireAfterSeconds=USAGE_RETENTION_DAYS * 86400, name="day_ttl"),
+    ]),
+    (db.shuffle_cursors, [
+        _index([("user_id", ASCENDING), ("kind", ASCENDING)], unique=True, name="user_id_kind_unique"),
+    ]),
+]
+
+
+# -------------------- DUPLICATE MERGING --------------------
+def _as_utc(value):
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _merge_users(docs):
+    """Later docs win, but keep the longest premium and today's usage."""
+    merged = {}
+    for doc in docs:
+        merged.update({k: v for k, v in doc.items() if v is not None})
+
+    expiries = [_as_utc(d["expiry_time"]) for d in docs if isinstance(d.get("expiry_time"), datetime)]
+    merged["expiry_time"] = max(expiries) if expiries else None
+
+    dated = [d for d in docs if isinstance(d.get("last_date"), datetime)]
+    if dated:
+        latest = max(dated, key=lambda d: _as_utc(d["last_date"]))
+        merged["last_date"] = latest["last_date"]
+        merged["video_count"] = latest.get("video_count", 0)
+    return merged
+
+def _merge_history(docs):
+    """Union of every seen bitmap (old `seen` lists are kept for migration)."""
+    merged = {}
+    bits = 0
+    seen = []
+    for doc in docs:
+        merged.update(doc)
+        bits |= decode_bitmap(doc.get("bitmap"))
+        seen.extend(doc.get("seen", []))
+    merged["bitmap"] = encode_bitmap(bits)
+    if seen:
+        merged["seen"] = list(dict.fromkeys(seen))
+    return merged
+
+def _merge_default(docs):
+    merged = {}
+    for doc in docs:
+        merged.update({k: v for k, v in doc.items() if v is not None})
+    return merged
+
+MERGERS = {
+    db.users.name: _merge_users,
+    db.historys.name: _merge_history,
+    db.braz_history.name: _merge_history,
+}
+
+async def merge_duplicates(collection, keys):
+    """Collapse documents sharing the same unique key into the oldest one."""
+    group_id = {k: f"${k}" for k in keys}
+    pipeline = [
+        {"$group": {"_id": group_id, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    merge = MERGERS.get(collection.name, _merge_default)
+    merged = 0
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        docs = await collection.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(length=None)
+        if len(docs) < 2:
+            continue
+        keep = docs[0]["_id"]
+        doc = merge(docs)
+        doc["_id"] = keep
+        await collection.replace_one({"_id": keep}, doc)
+        await collection.delete_many({"_id": {"$in": [d["_id"] for d in docs[1:]]}})
+        merged += len(docs) - 1
+    return merged
+
+
+# -------------------- INDEX MANAGER --------------------
+async def _report(client, status, text):
+    if not client:
+        return status
+    try:
+        if status:
+            await status.edit(text)
+            return status
+        return await client.send_message(LOG_CHANNEL, text)
+    except Exception as e:
+        logger.warning(f"Index report failed: {e}")
+        return status
+
+def _satisfies(index, spec):
+    """An existing index on the same key is enough only if its options match the plan."""
+    if spec.get("unique") and not index.get("unique"):
+        return False
+    return index.get("expireAfterSeconds") == spec.get("expireAfterSeconds")
+
+async def ensure_indexes(client=None):
+    """
+    Idempotent: creates every index in INDEX_PLAN, merging duplicate documents
+    first wherever a unique index would otherwise fail. Progress is reported
+    to LOG_CHANNEL when a client is given.
+    """
+    start = time.time()
+    lines = []
+    status = None
+
+    for collection, models in INDEX_PLAN:
+        info = await collection.index_information()
+        existing = {tuple(tuple(k) for k in idx["key"]): (name, idx) for name, idx in info.items()}
+        built = 0
+        removed = 0
+        for model in models:
+            spec = model.document
+            current = existing.get(tuple(spec["key"].items()))
+            if current and _satisfies(current[1], spec):
+                continue
+            keys = list(spec["key"].keys())
+            try:
+                if spec.get("unique"):
+                    removed += await merge_duplicates(collection, keys)
+                if current:
+                    # Same key, other options (e.g. an old non-unique index) -> rebuild it
+                    await collection.drop_index(current[0])
+                await collection.create_indexes([model])
+                built += 1
+            except (DuplicateKeyError, OperationFailure) as e:
+                logger.error(f"Index {collection.name}.{spec['name']} failed: {e}")
+                lines.append(f"⚠️ {collection.name}.{spec['name']}: {e}")
+
+        if built or removed:
+            lines.append(
+                f"✅ {collection.name}: {built} index(es) built"
+                + (f", {removed} duplicate(s) merged" if removed else "")
+            )
+            status = await _report(
+                client, status,
+                "<b>🗂 Building database indexes...</b>\n\n" + "\n".join(lines)
+            )
+
+    if lines:
+        await _report(
+            client, status,
+            "<b>🗂 Database indexes ready</b> "
+            f"(<code>{time.time() - start:.1f}s</code>)\n\n" + "\n".join(lines)
+        )
+    logger.info("🗂 Database indexes verified")
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+
+ACTIVE = ["queued", "running"]
+
+
+# -------------------- PERSISTENT JOB STORE --------------------
+class JobStore:
+    """
+    CRUD for one collection of resumable jobs (index_jobs, broadcast_jobs).
+    Every job has status / checkpoint / counters / status_chat / status_msg;
+    only queued or running jobs can change status.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def create(self, fields):
+        now = datetime.now(timezone.utc)
+        job = {**fields, "status": "queued", "created_at": now, "updated_at": now}
+        result = await self.collection.insert_one(job)
+        job["_id"] = result.inserted_id
+        return job
+
+    async def get(self, job_id):
+        return await self.collection.find_one({"_id": ObjectId(job_id)})
+
+    async def get_pending(self):
+        # Interrupted (running) jobs first, then the queue in FIFO order
+        jobs = await self.collection.find(
+            {"status": {"$in": ACTIVE}}
+        ).sort("created_at", 1).to_list(length=None)
+        return sorted(jobs, key=lambda j: j["status"] != "running")
+
+    async def count_queued(self):
+        return await self.collection.count_documents({"status": {"$in": ACTIVE}})
+
+    async def save_checkpoint(self, job_id, checkpoint, counters):
+        await self.collection.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {
+                "checkpoint": checkpoint,
+                "counters": counters,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+
+    async def set_status(self, job_id, status):
+        """False if the job is already finished (done / cancelled / failed)."""
+        result = await self.collection.update_one(
+            {"_id": ObjectId(job_id), "status": {"$in": ACTIVE}},
+            {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
+        )
+        return result.matched_count == 1
@@ -0,0 +1,71 @@
+import time
+import asyncio
+import logging
+from database.users_db import db
+from info import STATS_REFRESH_INTERVAL
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+
+# -------------------- /stats SNAPSHOT SERVICE --------------------
+class StatsService:
+    """
+    Keeps one snapshot of the /stats numbers, refreshed in the background
+    every `interval` seconds. All queries of a refresh run concurrently;
+    plain totals use the collection metadata (estimated_document_count),
+    only the premium count is an exact (indexed) query.
+    """
+
+    def __init__(self, interval=300):
+        self.interval = interval
+        self.snapshot = None
+        self.updated_at = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def age(self):
+        return time.time() - self.updated_at if self.snapshot else None
+
+    async def collect(self):
+        (total_users, premium_users, mixfiles, brazzers,
+         blocked, redeem, dbsize) = await asyncio.gather(
+            db.users.estimated_document_count(),
+            db.premium_users_count(),
+            db.videos.estimated_document_count(),
+            db.brazzers.estimated_document_count(),
+            db.blocked_users.estimated_document_count(),
+            db.codes.estimated_document_count(),
+            db.get_db_size(),
+        )
+        return {
+            "total_users": total_users,
+            "premium_users": premium_users,
+            "mixfiles": mixfiles,
+            "brazzers": brazzers,
+            "blocked": blocked,
+            "redeem": redeem,
+            "dbsize": dbsize,
+        }
+
+    async def refresh(self):
+        async with self._lock:
+            self.snapshot = await self.collect()
+            self.updated_at = time.time()
+        return self.snapshot
+
+    async def get(self):
+        """Current snapshot; only the very first call waits for the queries."""
+        if self.snapshot is None:
+            await self.refresh()
+        return self.snapshot
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Stats refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+stats_service = StatsService(STATS_REFRESH_INTERVAL)
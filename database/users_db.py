@@ -3,7 +3,17 @@ import random
 import logging
 from datetime import datetime, timezone, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
-from info import DB_URL, DB_NAME, TIMEZONE, VERIFY_EXPIRE
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from info import (
+    DB_URL, DB_NAME, TIMEZONE, VERIFY_EXPIRE, DELIVERY_MODE,
+    DAILY_LIMIT, VERIFICATION_DAILY_LIMIT, PREMIUM_DAILY_LIMIT,
+    LIVE_INDEX_WINDOW, LIVE_INDEX_BATCH, USER_CACHE_TTL, USER_CACHE_SIZE
+)
+from database.cache import TTLCache
+from database.catalog import VideoCatalog, next_seq
+from database.write_buffer import WriteBuffer
+from database.jobs import JobStore
 
 # Logger Setup
 logger = logging.getLogger(__name__)
@@ -19,6 +29,36 @@ def get_ist_now():
 def get_ist_today():
     return get_ist_now().date()
 
+# Today's delivered videos from an already loaded `users` doc
+def video_count_today(user):
+    if not user:
+        return 0
+    last_date = user.get("last_date")
+    if isinstance(last_date, datetime):
+        if last_date.tzinfo is not None:
+            check_date = last_date.astimezone(pytz.timezone(TIMEZONE)).date()
+        else:
+            check_date = last_date.date()
+        if check_date == get_ist_today():
+            return user.get("video_count", 0)
+    return 0
+
+# Verification state from an already loaded `misc` doc (None = never verified)
+def verified_from_doc(doc):
+    # Fetch date safely
+    pastDate = (doc or {}).get("last_verified")
+
+    # If date is missing for some reason, default to old date
+    if not pastDate:
+        pastDate = datetime(2020, 5, 17, 0, 0, 0, tzinfo=timezone.utc)
+
+    # Standardize pastDate to UTC
+    if pastDate.tzinfo is None:
+        pastDate = pastDate.replace(tzinfo=timezone.utc)
+
+    # 🟢 FAST EXPIRE LOGIC
+    return datetime.now(timezone.utc) - pastDate < timedelta(seconds=VERIFY_EXPIRE)
+
 # -------------------- DATABASE CLASS --------------------
 class Database:
     def __init__(self):
@@ -32,35 +72,128 @@ class Database:
         self.refer_collection = mydb.referrals
         self.braz_history = mydb.braz_history        
         self.blocked_users = mydb.blocked_users
+        self.counters = mydb.counters
+        self.shuffle_cursors = mydb.shuffle_cursors
+        self.index_jobs = mydb.index_jobs
+        self.channel_state = mydb.channel_state
+        self.usage_daily = mydb.usage_daily
+        self.broadcast_jobs = mydb.broadcast_jobs
+        self.deleted_users = mydb.deleted_users
+        self.delete_queue = mydb.delete_queue
+
+        # Resumable background jobs (same CRUD for both queues)
+        self.index_job_store = JobStore(self.index_jobs)
+        self.broadcast_job_store = JobStore(self.broadcast_jobs)
+
+        # In-memory catalogs for fast unseen picks (loaded on bot start)
+        self.video_catalog = VideoCatalog(self.videos, self.historys, self.counters, self.shuffle_cursors)
+        self.brazzers_catalog = VideoCatalog(self.brazzers, self.braz_history, self.counters, self.shuffle_cursors)
+
+        # Live channel uploads are micro-batched into bulk writes
+        self.video_buffer = WriteBuffer(self._flush_live_videos, LIVE_INDEX_BATCH, LIVE_INDEX_WINDOW)
+        self.brazzers_buffer = WriteBuffer(self._flush_live_brazzers, LIVE_INDEX_BATCH, LIVE_INDEX_WINDOW)
+
+        # Short-lived snapshots of `users` / `misc` docs. Every write method
+        # below that touches a user drops that user's entry (write-through).
+        self.user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+        self.verify_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+    def invalidate_user(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return
+        self.user_cache.pop(user_id)
+        self.verify_cache.pop(user_id)
 
     # ---------- USERS ----------
     async def add_user(self, id, name):
-        if not await self.users.find_one({"id": id}):
-            await self.users.insert_one({
-                "id": id,
-                "name": name,
-                "video_count": 0,
-                "last_date": None,
-                "expiry_time": None
-            })
+        """Upsert on the unique `id` index: two racing first requests can't both insert."""
+        try:
+            result = await self.users.update_one(
+                {"id": id},
+                {"$setOnInsert": {
+                    "name": name,
+                    "video_count": 0,
+                    "last_date": None,
+                    "expiry_time": None
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The other request's upsert won -> the user exists now
+            result = None
+        self.invalidate_user(id)
+        return bool(result and result.upserted_id)
 
     async def is_user_exist(self, id):
-        return bool(await self.users.find_one({'id': int(id)}))
+        return bool(await self.get_user(int(id)))
 
     async def total_users_count(self):
         return await self.users.count_documents({})
 
     async def delete_user(self, user_id):
         await self.users.delete_many({'id': int(user_id)})
+        self.invalidate_user(user_id)
+
+    async def prune_users(self, entries):
+        """
+        Remove dead users in one delete_many. `entries` is [(user_id, reason)];
+        the user documents are archived in `deleted_users` first.
+        """
+        reasons = dict(entries)
+        if not reasons:
+            return 0
+        ids = list(reasons)
+        now = datetime.now(timezone.utc)
+        docs = await self.users.find({"id": {"$in": ids}}).to_list(length=None)
+        if docs:
+            tombstones = []
+            for doc in docs:
+                doc["user_doc_id"] = doc.pop("_id")
+                doc["reason"] = reasons.get(doc["id"])
+                doc["deleted_at"] = now
+                tombstones.append(doc)
+            await self.deleted_users.insert_many(tombstones, ordered=False)
+        result = await self.users.delete_many({"id": {"$in": ids}})
+        for user_id in ids:
+            self.invalidate_user(user_id)
+        return result.deleted_count
+
+    async def restore_user(self, user_id):
+        """Bring back the latest archived copy of a pruned user."""
+        doc = await self.deleted_users.find_one({"id": int(user_id)}, sort=[("deleted_at", -1)])
+        if not doc:
+            return False
+        for key in ("_id", "user_doc_id", "reason", "deleted_at"):
+            doc.pop(key, None)
+        await self.users.update_one({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True)
+        await self.deleted_users.delete_many({"id": doc["id"]})
+        self.invalidate_user(user_id)
+        return True
 
     async def get_user(self, user_id):
-        return await self.users.find_one({"id": user_id})
+        """Cached for USER_CACHE_TTL seconds (None results too)."""
+        user = self.user_cache.get(user_id, False)
+        if user is False:
+            user = await self.users.find_one({"id": user_id})
+            self.user_cache.set(user_id, user)
+        return user
 
     async def update_user(self, user_data):
         await self.users.update_one({"id": user_data["id"]}, {"$set": user_data}, upsert=True)
+        self.invalidate_user(user_data["id"])
 
     async def get_all_users(self):
         return self.users.find({})
+
+    async def get_premium_users(self, skip=0, limit=20):
+        """One page of active premium users, soonest expiry first (expiry_time index)."""
+        cursor = self.users.find(
+            {"expiry_time": {"$gt": datetime.now(timezone.utc)}},
+            {"_id": 0, "id": 1, "name": 1, "username": 1, "expiry_time": 1}
+        ).sort("expiry_time", 1).skip(skip).limit(limit)
+        return await cursor.to_list(length=limit)
         
     # ---------- COUNTS ----------
     async def total_files_count(self):
@@ -133,6 +266,7 @@ class Database:
             {"id": user_id},
             {"$set": {"expiry_time": new_expiry}}
         )
+        self.invalidate_user(user_id)
         return new_expiry
         
     # ---------- BLOCK SYSTEM ----------
@@ -163,9 +297,10 @@ class Database:
             {"id": user_id},
             {"$set": {"temp_ban_expiry": expiry}}
         )
+        self.invalidate_user(user_id)
 
     async def is_temp_banned(self, user_id):
-        user = await self.users.find_one({"id": user_id})
+        user = await self.get_user(user_id)
         if not user or "temp_ban_expiry" not in user:
             return False, 0
             
@@ -180,6 +315,7 @@ class Database:
         else:
             # Ban expire ho gaya, remove field
             await self.users.update_one({"id": user_id}, {"$unset": {"temp_ban_expiry": ""}})
+            self.invalidate_user(user_id)
             return False, 0
             
     # ---------- PREMIUM / EXPIRY ----------
@@ -202,11 +338,16 @@ class Database:
             return now <= expiry_time
         else:
             await self.users.update_one({"id": user_id}, {"$set": {"expiry_time": None}})
+            self.invalidate_user(user_id)
             return False
 
     async def update_one(self, filter_query, update_data):
         try:
             result = await self.users.update_one(filter_query, update_data)
+            if "id" in filter_query:
+                self.invalidate_user(filter_query["id"])
+            else:
+                self.user_cache.clear()
             return result.matched_count == 1
         except Exception as e:
             print(f"Error updating document: {e}")
@@ -237,6 +378,7 @@ class Database:
             await self.users.update_one(
                 {"id": user["id"]}, {"$set": {reminder_key: True}}
             )
+            self.invalidate_user(user["id"])
         return reminder_users
 
     async def remove_premium_access(self, user_id):
@@ -244,6 +386,11 @@ class Database:
             {"id": user_id}, {"$set": {"expiry_time": None}}
         )
 
+    async def clear_reminder_flags(self, user_id, labels):
+        await self.update_one(
+            {"id": user_id}, {"$unset": {f"reminder_{label}_sent": "" for label in labels}}
+        )
+
     async def premium_users_count(self):
         return await self.users.count_documents({
             "expiry_time": {"$gt": datetime.now(timezone.utc)}
@@ -254,16 +401,66 @@ class Database:
         return stats.get("dataSize", 0)
 
     # ---------- VIDEOS SYSTEM ----------
+    async def _add_videos_bulk(self, collection, catalog, items):
+        """
+        Insert many (file_unique_id, file_id) pairs with one unordered
+        insert_many. Returns one result per item:
+        True = saved, False = duplicate, None = error.
+        """
+        results = [False] * len(items)
+        if not items:
+            return results
+
+        # One lookup for the whole batch, so seq numbers aren't burnt on duplicates
+        unique_ids = [fuid for fuid, _ in items]
+        existing = {
+            doc["file_unique_id"]
+            async for doc in collection.find(
+                {"file_unique_id": {"$in": unique_ids}}, {"file_unique_id": 1, "_id": 0}
+            )
+        }
+
+        new_items = []
+        for i, (fuid, fid) in enumerate(items):
+            if fuid in existing:
+                continue
+            existing.add(fuid)
+            new_items.append((i, fuid, fid))
+        if not new_items:
+            return results
+
+        first = await next_seq(self.counters, collection.name, len(new_items))
+        now = datetime.now(timezone.utc)
+        docs = [{
+            "file_unique_id": fuid,
+            "file_id": fid,
+            "seq": first + n,
+            "rnd": random.random(),
+            "added_at": now
+        } for n, (_, fuid, fid) in enumerate(new_items)]
+
+        failed = {}
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate key = someone else indexed it in the meantime
+            for err in e.details.get("writeErrors", []):
+                failed[err["index"]] = False if err.get("code") == 11000 else None
+
+        for n, (i, _, fid) in enumerate(new_items):
+            if n in failed:
+                results[i] = failed[n]
+                continue
+            results[i] = True
+            catalog.add(docs[n]["seq"], fid)
+        return results
+
+    async def add_videos_bulk(self, items):
+        return await self._add_videos_bulk(self.videos, self.video_catalog, items)
+
     async def add_video(self, file_unique_id, file_id):
-        exists = await self.videos.find_one({"file_unique_id": file_unique_id})
-        if not exists:
-            await self.videos.insert_one({
-                "file_unique_id": file_unique_id,
-                "file_id": file_id,
-                "added_at": datetime.now(timezone.utc)
-            })
-            return True
-        return False
+        results = await self.add_videos_bulk([(file_unique_id, file_id)])
+        return results[0] is True
 
     async def total_videos(self):
         return await self.videos.count_documents({})
@@ -272,206 +469,385 @@ class Database:
     async def delete_main_data(self):
         await self.videos.delete_many({})
         await self.historys.delete_many({})
+        self.video_catalog.clear()
         return True
 
     # 2. Brazzers aur Braz History delete karne ke liye
     async def delete_brazzers_data(self):
         await self.brazzers.delete_many({})
         await self.braz_history.delete_many({})
+        self.brazzers_catalog.clear()
         return True
         
-    async def increase_video_count(self, user_id, username):
-        today = get_ist_today()
-        # Convert today date to datetime object for storage (Midnight)
-        today_dt = datetime.combine(today, datetime.min.time())
+    # ---------- DAILY USAGE LEDGER ----------
+    # One row per (user, IST day): {user_id, day, count, username, created_at}.
+    # Rows expire after USAGE_RETENTION_DAYS (TTL index on `day`).
+    async def record_usage(self, user_id, username, amount=1):
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        for _ in range(2):
+            try:
+                await self.usage_daily.update_one(
+                    {"user_id": user_id, "day": today_dt},
+                    {"$inc": {"count": amount},
+                     "$set": {"username": username},
+                     "$setOnInsert": {"created_at": datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+                return
+            except DuplicateKeyError:
+                # Two first deliveries of the day raced on the upsert -> retry as update
+                continue
+
+    async def release_usage(self, user_id):
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        await self.usage_daily.update_one(
+            {"user_id": user_id, "day": today_dt, "count": {"$gt": 0}},
+            {"$inc": {"count": -1}}
+        )
 
-        user = await self.users.find_one({"id": user_id})
+    def get_usage_today(self):
+        """Cursor over today's active users (indexed range query on `day`)."""
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        return self.usage_daily.find({"day": today_dt, "count": {"$gt": 0}})
+
+    def daily_usage_report(self):
+        """
+        Today's active users with plan + quota, computed server side in one
+        aggregation (ledger -> $lookup users / misc -> $switch on the plan).
+        Same rules as has_premium_access() / is_user_verified().
+        Yields: user_id, username, used, plan, daily_limit, remaining, expiry_time.
+        """
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        now = datetime.now(timezone.utc)
+        verified_after = now - timedelta(seconds=VERIFY_EXPIRE)
+
+        pipeline = [
+            {"$match": {"day": today_dt, "count": {"$gt": 0}}},
+            {"$lookup": {
+                "from": self.users.name,
+                "localField": "user_id",
+                "foreignField": "id",
+                "as": "user"
+            }},
+            {"$lookup": {
+                "from": self.misc.name,
+                "localField": "user_id",
+                "foreignField": "user_id",
+                "as": "verify"
+            }},
+            {"$set": {
+                "expiry_time": {"$arrayElemAt": ["$user.expiry_time", 0]},
+                "last_verified": {"$arrayElemAt": ["$verify.last_verified", 0]},
+            }},
+            {"$set": {
+                "plan": {"$switch": {
+                    "branches": [
+                        {"case": {"$and": [
+                            {"$eq": [{"$type": "$expiry_time"}, "date"]},
+                            {"$gte": ["$expiry_time", now]}
+                        ]}, "then": "Paid"},
+                        {"case": {"$and": [
+                            {"$eq": [{"$type": "$last_verified"}, "date"]},
+                            {"$gt": ["$last_verified", verified_after]}
+                        ]}, "then": "Verified"},
+                    ],
+                    "default": "Free"
+                }}
+            }},
+            {"$set": {
+                "daily_limit": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$plan", "Paid"]}, "then": PREMIUM_DAILY_LIMIT},
+                        {"case": {"$eq": ["$plan", "Verified"]}, "then": VERIFICATION_DAILY_LIMIT},
+                    ],
+                    "default": DAILY_LIMIT
+                }}
+            }},
+            {"$project": {
+                "_id": 0,
+                "user_id": 1,
+                "username": {"$ifNull": ["$username", {"$arrayElemAt": ["$user.username", 0]}]},
+                "used": "$count",
+                "plan": 1,
+                "daily_limit": 1,
+                "remaining": {"$max": [{"$subtract": ["$daily_limit", "$count"]}, 0]},
+                "expiry_time": {"$cond": [{"$eq": ["$plan", "Paid"]}, "$expiry_time", None]},
+            }},
+        ]
+        return self.usage_daily.aggregate(pipeline, allowDiskUse=True)
+
+    async def reserve_video_slot(self, user_id, username, limit):
+        """
+        Atomically take one slot of today's quota.
+        Day rollover and the limit check run inside a single update pipeline,
+        so parallel requests can never push a user past `limit`.
+        Returns the new count, or None if the limit is already reached.
+        """
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        for _ in range(2):
+            doc = await self.users.find_one_and_update(
+                {
+                    "id": user_id,
+                    "$or": [
+                        {"last_date": {"$ne": today_dt}},
+                        {"video_count": {"$lt": limit}}
+                    ]
+                },
+                [{"$set": {
+                    "video_count": {"$cond": [
+                        {"$eq": ["$last_date", today_dt]},
+                        {"$add": [{"$ifNull": ["$video_count", 0]}, 1]},
+                        1
+                    ]},
+                    "last_date": today_dt,
+                    "username": {"$literal": username}
+                }}],
+                projection={"video_count": 1, "_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            self.invalidate_user(user_id)
+            if doc:
+                await self.record_usage(user_id, username)
+                return doc["video_count"]
+            # No match: either limit reached, or the user has no document yet
+            if await self.get_user(user_id):
+                return None
+            await self.add_user(user_id, username)
+        return None
+
+    async def release_video_slot(self, user_id):
+        """Give back a reserved slot (e.g. the video could not be sent)."""
+        today_dt = datetime.combine(get_ist_today(), datetime.min.time())
+        await self.users.update_one(
+            {"id": user_id, "last_date": today_dt, "video_count": {"$gt": 0}},
+            {"$inc": {"video_count": -1}}
+        )
+        self.invalidate_user(user_id)
+        await self.release_usage(user_id)
 
-        if user:
-            last_date = user.get("last_date")
-            
-            # Safe conversion of stored date
-            if isinstance(last_date, datetime):
-                if last_date.tzinfo is not None:
-                    # Convert to IST if aware
-                    check_date = last_date.astimezone(pytz.timezone(TIMEZONE)).date()
-                else:
-                    # Treat naive as is
-                    check_date = last_date.date()
-            else:
-                check_date = None
-
-            if check_date != today:
-                await self.users.update_one(
-                    {"id": user_id},
-                    {"$set": {
-                        "video_count": 1,
-                        "last_date": today_dt,
-                        "username": username
-                    }}
-                )
-            else:
-                await self.users.update_one(
-                    {"id": user_id},
-                    {"$inc": {"video_count": 1},
-                     "$set": {"username": username}}
-                )
-        else:
-            await self.users.insert_one({
-                "id": user_id,
-                "name": username,
-                "video_count": 1,
-                "last_date": today_dt,
-                "expiry_time": None
-            })
-            
     async def get_video_count(self, user_id: int):
-        today = get_ist_today()
-        user = await self.users.find_one({"id": user_id})
-        if user:
-            last_date = user.get("last_date")
-            if isinstance(last_date, datetime):
-                if last_date.tzinfo is not None:
-                    check_date = last_date.astimezone(pytz.timezone(TIMEZONE)).date()
-                else:
-                    check_date = last_date.date()
-                    
-                if check_date == today:
-                    return user.get("video_count", 0)
-        return 0
+        return video_count_today(await self.get_user(user_id))
         
     async def get_unseen_video(self, user_id):
-        seen = await self.historys.find_one({"user_id": user_id})
-        seen_ids = seen.get("seen", []) if seen else []
-
-        # Optimization: Only fetch file_id field, limit 500
-        cursor = self.videos.find({"file_id": {"$nin": seen_ids}}, {"file_id": 1}).limit(500)
-        unseen_videos = await cursor.to_list(length=500)
+        if DELIVERY_MODE == "shuffle":
+            return await self.video_catalog.pick_shuffled(user_id)
 
-        if not unseen_videos:
+        file_id = await self.video_catalog.pick_unseen(user_id)
+        if not file_id:
             return None
-
-        video = random.choice(unseen_videos)
-        await self.mark_seen(user_id, video["file_id"])
-        return video["file_id"]
+        await self.mark_seen(user_id, file_id)
+        return file_id
 
     async def get_random_video(self):
         """
         Gets a random video when user has seen everything.
-        Uses MongoDB $sample for efficiency.
+        Uses the indexed `rnd` key instead of a $sample aggregation.
         """
         try:
-            pipeline = [{"$sample": {"size": 1}}]
-            cursor = self.videos.aggregate(pipeline)
-            result = await cursor.to_list(length=1)
-            
-            if result:
-                return result[0]["file_id"]
+            return await self.video_catalog.random_file_id()
         except Exception as e:
             print(f"Random video error: {e}")
         return None
 
     async def mark_seen(self, user_id, file_id):
-        await self.historys.update_one(
-            {"user_id": user_id},
-            {"$addToSet": {"seen": file_id}},
-            upsert=True
-        )
+        # History is stored as a compressed bitmap of video seq numbers
+        await self.video_catalog.mark_seen(user_id, file_id)
 
     async def reset_seen_videos(self, user_id: int):
-        await self.historys.update_one(
-            {"user_id": user_id},
-            {"$set": {"seen": []}},
-            upsert=True
-        )
+        if DELIVERY_MODE == "shuffle":
+            return await self.video_catalog.reset_shuffle(user_id)
+        await self.video_catalog.reset_user(user_id)
         
+    async def add_brazzers_bulk(self, items):
+        return await self._add_videos_bulk(self.brazzers, self.brazzers_catalog, items)
+
+    # ---------- LIVE CHANNEL INDEXING (buffered) ----------
+    async def _flush_live(self, add_bulk, items):
+        """items: (file_unique_id, file_id, chat_id, msg_id) -> one bulk insert + one hwm update per chat."""
+        results = await add_bulk([(fuid, fid) for fuid, fid, _, _ in items])
+        top = {}
+        for _, _, chat_id, msg_id in items:
+            top[chat_id] = max(top.get(chat_id, 0), msg_id)
+        for chat_id, msg_id in top.items():
+            await self.update_channel_hwm(chat_id, msg_id)
+        return [r is True for r in results]
+
+    async def _flush_live_videos(self, items):
+        return await self._flush_live(self.add_videos_bulk, items)
+
+    async def _flush_live_brazzers(self, items):
+        return await self._flush_live(self.add_brazzers_bulk, items)
+
+    async def queue_video(self, file_unique_id, file_id, chat_id, msg_id):
+        """Buffered add_video for channel posts; returns True if it was new."""
+        return await self.video_buffer.add((file_unique_id, file_id, chat_id, msg_id))
+
+    async def queue_brazzers_video(self, file_unique_id, file_id, chat_id, msg_id):
+        return await self.brazzers_buffer.add((file_unique_id, file_id, chat_id, msg_id))
+
     async def add_brazzers_video(self, file_unique_id, file_id):
-        exists = await self.brazzers.find_one({"file_unique_id": file_unique_id})
-        if not exists:
-            await self.brazzers.insert_one({
-                "file_unique_id": file_unique_id,
-                "file_id": file_id
-            })
-            return True
-        return False
+        results = await self.add_brazzers_bulk([(file_unique_id, file_id)])
+        return results[0] is True
 
     # ✅ See Unseen Brazzers
     async def get_unseen_brazzers(self, user_id):
-        seen = await self.braz_history.find_one({"user_id": user_id})
-        seen_ids = seen.get("seen", []) if seen else []
-        cursor = self.brazzers.find({"file_id": {"$nin": seen_ids}})
-        unseen_videos = await cursor.to_list(length=1000)
+        if DELIVERY_MODE == "shuffle":
+            return await self.brazzers_catalog.pick_shuffled(user_id)
 
-        if not unseen_videos:
+        file_id = await self.brazzers_catalog.pick_unseen(user_id)
+        if not file_id:
             return None
+        await self.mark_brazzers_seen(user_id, file_id)
+        return file_id
 
-        video = random.choice(unseen_videos)
-        await self.mark_brazzers_seen(user_id, video["file_id"])
-        return video["file_id"]
+    async def get_random_brazzers(self):
+        try:
+            return await self.brazzers_catalog.random_file_id()
+        except Exception as e:
+            print(f"Random brazzers error: {e}")
+        return None
 
     # ✅ Mark Brazzers Seen
     async def mark_brazzers_seen(self, user_id, file_id):
-        await self.braz_history.update_one(
-            {"user_id": user_id},
-            {"$addToSet": {"seen": file_id}},
-            upsert=True
-        )
+        await self.brazzers_catalog.mark_seen(user_id, file_id)
         
     async def reset_seen_brazzers(self, user_id: int):
-        await self.braz_history.update_one(
-            {"user_id": user_id},
-            {"$set": {"seen": []}},
+        if DELIVERY_MODE == "shuffle":
+            return await self.brazzers_catalog.reset_shuffle(user_id)
+        await self.brazzers_catalog.reset_user(user_id)
+            
+    # ---------- INDEX / BROADCAST JOBS ----------
+    # Both live in a JobStore (database/jobs.py); only the job fields differ.
+    async def create_index_job(self, chat_id, chat_title, last_msg_id, skip, target_db, status_chat, status_msg):
+        return await self.index_job_store.create({
+            "chat_id": chat_id,
+            "chat_title": chat_title,
+            "last_msg_id": last_msg_id,
+            "target_db": target_db,
+            "checkpoint": skip,   # last message id already processed
+            "counters": {"saved": 0, "duplicate": 0, "deleted": 0, "no_media": 0, "errors": 0},
+            "status_chat": status_chat,
+            "status_msg": status_msg
+        })
+
+    async def create_broadcast_job(self, source_chat, source_msg, is_pin, total, status_chat, status_msg,
+                                   segment="all", days=None, segment_at=None):
+        return await self.broadcast_job_store.create({
+            "source_chat": source_chat,
+            "source_msg": source_msg,
+            "is_pin": is_pin,
+            "segment": segment,
+            "days": days,
+            "segment_at": segment_at or datetime.now(timezone.utc),   # fixed "now" -> same audience on resume
+            "total": total,
+            "checkpoint": None,   # users `_id` below which everyone is done
+            "counters": {"done": 0, "success": 0, "blocked": 0, "deleted": 0, "failed": 0},
+            "status_chat": status_chat,
+            "status_msg": status_msg
+        })
+
+    # ---------- BROADCAST SEGMENTS ----------
+    # segment -> (collection, query, user id field); every query is indexed
+    def segment_query(self, segment, days=None, at=None):
+        at = at or datetime.now(timezone.utc)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        if segment == "premium":
+            return self.users, {"expiry_time": {"$gt": at}}, "id"
+        if segment == "free":
+            return self.users, {"$or": [{"expiry_time": None}, {"expiry_time": {"$lte": at}}]}, "id"
+        if segment == "active":
+            today = at.astimezone(pytz.timezone(TIMEZONE)).date()
+            since = datetime.combine(today - timedelta(days=(days or 7) - 1), datetime.min.time())
+            return self.users, {"last_date": {"$gte": since}}, "id"
+        if segment == "inactive":
+            return self.users, {"last_date": None}, "id"
+        if segment == "verified":
+            return self.misc, {"last_verified": {"$gt": at - timedelta(seconds=VERIFY_EXPIRE)}}, "user_id"
+        return self.users, {}, "id"
+
+    async def count_segment(self, segment, days=None, at=None):
+        collection, query, _ = self.segment_query(segment, days, at)
+        if not query:
+            return await collection.estimated_document_count()
+        return await collection.count_documents(query)
+
+    def get_segment_ids_after(self, segment, days=None, at=None, last_id=None):
+        """(`_id`, user id) of the segment in `_id` order, starting after `last_id`."""
+        collection, query, id_field = self.segment_query(segment, days, at)
+        if last_id:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        return collection.find(query, {id_field: 1}).sort("_id", 1), id_field
+
+    # ---------- AUTO DELETE QUEUE ----------
+    async def schedule_delete(self, chat_id, message_ids, delay):
+        await self.delete_queue.insert_one({
+            "chat_id": chat_id,
+            "message_ids": list(message_ids),
+            "due_at": datetime.now(timezone.utc) + timedelta(seconds=delay)
+        })
+
+    async def get_due_deletes(self, limit=1000):
+        return await self.delete_queue.find(
+            {"due_at": {"$lte": datetime.now(timezone.utc)}}
+        ).sort("due_at", 1).limit(limit).to_list(length=limit)
+
+    async def remove_deletes(self, ids):
+        await self.delete_queue.delete_many({"_id": {"$in": ids}})
+
+    # ---------- CHANNEL HIGH-WATER MARK ----------
+    async def update_channel_hwm(self, chat_id, msg_id):
+        """Remember the highest message id indexed from a source channel."""
+        await self.channel_state.update_one(
+            {"_id": chat_id},
+            {"$max": {"hwm": msg_id}},
             upsert=True
         )
-            
+
+    async def get_channel_hwm(self, chat_id):
+        state = await self.channel_state.find_one({"_id": chat_id})
+        return state.get("hwm") if state else None
+
     # ---------- VERIFICATION SYSTEM ----------
     async def get_notcopy_user(self, user_id):
         user_id = int(user_id)
-        user = await self.misc.find_one({"user_id": user_id})
-        
+        user = self.verify_cache.get(user_id)
+        if user:
+            return user
         # Use UTC for default date
         default_date = datetime(2020, 5, 17, 0, 0, 0, tzinfo=timezone.utc)
-
-        if not user:
-            res = {
-                "user_id": user_id,
-                "last_verified": default_date,
-            }
-            # Insert and then return (safest method)
-            await self.misc.insert_one(res)
-            return res
+        try:
+            # Upsert on the unique `user_id` index instead of find + insert
+            user = await self.misc.find_one_and_update(
+                {"user_id": user_id},
+                {"$setOnInsert": {"last_verified": default_date}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            user = await self.misc.find_one({"user_id": user_id})
+        self.verify_cache.set(user_id, user)
         return user
 
     async def update_notcopy_user(self, user_id, value: dict):
         user_id = int(user_id)
         myquery = {"user_id": user_id}
         newvalues = {"$set": value}
-        return await self.misc.update_one(myquery, newvalues)
+        result = await self.misc.update_one(myquery, newvalues)
+        self.verify_cache.pop(user_id)
+        return result
 
-    async def is_user_verified(self, user_id):
-        user = await self.get_notcopy_user(user_id)
-        
-        # Fetch date safely
-        pastDate = user.get("last_verified")
-        
-        # If date is missing for some reason, default to old date
-        if not pastDate:
-             pastDate = datetime(2020, 5, 17, 0, 0, 0, tzinfo=timezone.utc)
+    async def get_verify_doc(self, user_id):
+        """misc doc of a user, or None. Read only (never creates one), cached like get_user."""
+        user_id = int(user_id)
+        doc = self.verify_cache.get(user_id, False)
+        if doc is False:
+            doc = await self.misc.find_one({"user_id": user_id})
+            self.verify_cache.set(user_id, doc)
+        return doc
 
-        # Standardize pastDate to UTC
-        if pastDate.tzinfo is None:
-             pastDate = pastDate.replace(tzinfo=timezone.utc)
-        
-        # Get current time in UTC
-        current_time = datetime.now(timezone.utc)
-        
-        # 🟢 FAST EXPIRE LOGIC
-        time_diff = current_time - pastDate
-        
-        if time_diff < timedelta(seconds=VERIFY_EXPIRE):
-            return True
-            
-        return False
+    async def is_user_verified(self, user_id):
+        return verified_from_doc(await self.get_notcopy_user(user_id))
 
     async def create_verify_id(self, user_id: int, hash, file_id=None):
         res = {"user_id": user_id, "hash": hash, "verified": False, "file_id": file_id}
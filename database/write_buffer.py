@@ -0,0 +1,77 @@
+import asyncio
+import logging
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+
+# -------------------- MICRO-BATCH WRITE BUFFER --------------------
+class WriteBuffer:
+    """
+    Collects items for up to `window` seconds (or until `max_items` are
+    waiting) and writes them with `flush_fn(items)` calls of at most
+    `max_items` each. Only one flush runs at a time; items that arrive
+    while it writes go out in its next call.
+
+    `flush_fn` must return one result per item; every caller of `add()`
+    gets back the result for its own item.
+    """
+
+    def __init__(self, flush_fn, max_items=100, window=0.5):
+        self.flush_fn = flush_fn
+        self.max_items = max(max_items, 1)
+        self.window = window
+        self._items = []
+        self._futures = []
+        self._timer = None
+        self._flushing = None
+
+    async def add(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._items.append(item)
+        self._futures.append(future)
+
+        # A running flush picks new items up itself
+        if not self._flushing:
+            if len(self._items) >= self.max_items:
+                self._schedule_flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._schedule_flush)
+
+        return await future
+
+    def _schedule_flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._flushing:
+            self._flushing = asyncio.ensure_future(self._drain())
+
+    async def flush(self):
+        """Write everything pending now."""
+        self._schedule_flush()
+        await asyncio.shield(self._flushing)
+
+    async def _drain(self):
+        try:
+            while self._items:
+                items, futures = self._items[:self.max_items], self._futures[:self.max_items]
+                del self._items[:self.max_items]
+                del self._futures[:self.max_items]
+                await self._write(items, futures)
+        finally:
+            self._flushing = None
+
+    async def _write(self, items, futures):
+        try:
+            results = await self.flush_fn(items)
+        except Exception as e:
+            logger.error(f"Write buffer flush failed ({len(items)} items): {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
@@ -57,6 +57,42 @@ PROTECT_CONTENT = str_to_bool(environ.get("PROTECT_CONTENT"), True)
 DAILY_LIMIT = int(environ.get("DAILY_LIMIT", "10"))
 VERIFICATION_DAILY_LIMIT = int(environ.get("VERIFICATION_DAILY_LIMIT", "20"))
 PREMIUM_DAILY_LIMIT = int(environ.get("PREMIUM_DAILY_LIMIT", "50"))
+
+# =========================================================
+# ⚡ PERFORMANCE TUNING
+# =========================================================
+# Max users whose seen-bitsets are kept in RAM by the video catalog
+CATALOG_CACHE_USERS = int(environ.get("CATALOG_CACHE_USERS", "5000"))
+# How unseen videos are chosen:
+#   history -> random pick excluding the user's stored seen bitmap
+#   shuffle -> per-user deterministic shuffle, only a position counter is stored
+DELIVERY_MODE = environ.get("DELIVERY_MODE", "history").lower()
+# /index: message ids per get_messages call (max 200) and batches fetched ahead
+INDEX_BATCH_SIZE = int(environ.get("INDEX_BATCH_SIZE", "200"))
+INDEX_CONCURRENCY = int(environ.get("INDEX_CONCURRENCY", "3"))
+# Live channel indexing: burst window (seconds) and max videos per bulk write
+LIVE_INDEX_WINDOW = float(environ.get("LIVE_INDEX_WINDOW", "0.5"))
+LIVE_INDEX_BATCH = int(environ.get("LIVE_INDEX_BATCH", "100"))
+# Cached user / verification documents (seconds to live, max users kept)
+USER_CACHE_TTL = int(environ.get("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(environ.get("USER_CACHE_SIZE", "10000"))
+# Days a per-user daily usage row is kept before MongoDB expires it
+USAGE_RETENTION_DAYS = int(environ.get("USAGE_RETENTION_DAYS", "35"))
+# Gzip admin exports (.txt.gz) instead of sending plain .txt files
+EXPORT_GZIP = str_to_bool(environ.get("EXPORT_GZIP"), False)
+# Seconds between background refreshes of the /stats snapshot
+STATS_REFRESH_INTERVAL = int(environ.get("STATS_REFRESH_INTERVAL", "300"))
+# Broadcast: messages/second across all workers (Telegram allows ~30),
+# parallel senders, and seconds between progress edits
+BROADCAST_RATE = float(environ.get("BROADCAST_RATE", "25"))
+BROADCAST_WORKERS = int(environ.get("BROADCAST_WORKERS", "16"))
+BROADCAST_PROGRESS_INTERVAL = int(environ.get("BROADCAST_PROGRESS_INTERVAL", "10"))
+# Dead users found while broadcasting are removed in batches of this size
+PRUNE_BATCH_SIZE = int(environ.get("PRUNE_BATCH_SIZE", "500"))
+# Force-subscribe: seconds a "joined" / "not joined" answer is reused
+FSUB_MEMBER_TTL = int(environ.get("FSUB_MEMBER_TTL", "600"))
+FSUB_NONMEMBER_TTL = int(environ.get("FSUB_NONMEMBER_TTL", "15"))
+
 #=========================================================
 # 🔗 SHORTLINK & VERIFICATION
 # =========================================================
@@ -1,9 +1,9 @@
-import os
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from database.users_db import db
 from info import ADMINS
 from plugins.ban_manager import ban_manager
+from utils import ReportWriter
 
 # ==================================================================
 # 🚫 BAN USER
@@ -25,7 +25,7 @@ async def ban_user_handler(client, message: Message):
         return await message.reply("❌ **You cannot ban an Admin!**", quote=True)
     try:
         await db.block_user(user_id, reason)
-        ban_manager.blocked_cache[user_id] = True
+        ban_manager.mark_blocked(user_id)
         await message.reply(
             f"✅ **User Banned!**\n\n🆔 `{user_id}`\n📝 `{reason}`",
             quote=True
@@ -54,9 +54,7 @@ async def unban_user_handler(client, message: Message):
         return await message.reply("❌ **Invalid User ID.**", quote=True)
     try:
         await db.unblock_user(user_id)
-        ban_manager.blocked_cache[user_id] = False
-        ban_manager.user_flood_history.pop(user_id, None)
-        ban_manager.user_warnings.pop(user_id, None)
+        ban_manager.reset_user(user_id)
         await message.reply(
             f"✅ **User Unbanned!**\n\n🆔 `{user_id}`",
             quote=True
@@ -78,32 +76,30 @@ async def unban_user_handler(client, message: Message):
 @Client.on_message(filters.command("blocked") & filters.user(ADMINS))
 async def list_blocked_users(client, message: Message):
     status_msg = await message.reply("🔄 **Fetching blocked users...**")
-    blocked_list = []
+
+    # Stream the cursor into an in-memory file, keep only 20 users for the chat view
+    report = ReportWriter(
+        "Blocked_Users_List.txt",
+        header="🚫 BLOCKED USERS LIST\n=====================\n\n",
+        preview=20
+    )
     cursor = await db.get_all_blocked_users()
     async for user in cursor:
-        blocked_list.append(user)
-    if not blocked_list:
+        report.add_row(
+            f"ID: {user['user_id']}\n"
+            f"Reason: {user.get('reason','N/A')}\n"
+            f"---------------------",
+            preview_text=f"• `{user['user_id']}` | _{user.get('reason','N/A')}_\n"
+        )
+    if not report.rows:
         return await status_msg.edit("✅ **No blocked users found.**")
-    if len(blocked_list) > 20:
-        file_path = "Blocked_Users_List.txt"
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("🚫 BLOCKED USERS LIST\n")
-            f.write("=====================\n\n")
-            for user in blocked_list:
-                f.write(f"ID: {user['user_id']}\n")
-                f.write(f"Reason: {user.get('reason','N/A')}\n")
-                f.write("---------------------\n")
-        await message.reply_document(
-            document=file_path,
-            caption=f"🚫 **Total Blocked Users:** `{len(blocked_list)}`"
+    if report.rows > 20:
+        await report.reply(
+            message,
+            caption=f"🚫 **Total Blocked Users:** `{report.rows}`"
         )
-        if os.path.exists(file_path):
-            os.remove(file_path)
         await status_msg.delete()
     else:
-        text = "**🚫 Blocked Users List:**\n\n"
-        for user in blocked_list:
-            text += f"• `{user['user_id']}` | _{user.get('reason','N/A')}_\n"
-        await status_msg.edit(text)
+        await status_msg.edit("**🚫 Blocked Users List:**\n\n" + "".join(report.preview))
 
 
@@ -1,16 +1,61 @@
 import time
+import asyncio
+from collections import deque
 from pyrogram.types import Message
 from database.users_db import db
-from info import LOG_CHANNEL, ADMINS
+from database.cache import TTLCache
+from info import LOG_CHANNEL, ADMINS, USER_CACHE_SIZE
 
 class BanManager:
-    def __init__(self):
+    def __init__(self, max_users=USER_CACHE_SIZE):
         self.FLOOD_LIMIT = 5
         self.TIME_WINDOW = 7
         self.WARNING_LIMIT = 3
-        self.user_flood_history = {}
-        self.user_warnings = {}
-        self.blocked_cache = {}   
+        self.WARNING_DECAY = 3600      # one warning is forgiven per hour without spam
+        self.BLOCK_CACHE_TTL = 600
+        # All three are bounded LRUs with idle expiry -> memory follows
+        # recently active users, not everyone who ever wrote to the bot.
+        # user_id -> deque of the last FLOOD_LIMIT message times (ring buffer)
+        self.user_flood_history = TTLCache(max_users, self.TIME_WINDOW)
+        # user_id -> (warnings, time of last warning)
+        self.user_warnings = TTLCache(max_users, self.WARNING_DECAY * 5)
+        self.blocked_cache = TTLCache(max_users, self.BLOCK_CACHE_TTL)
+
+    # ---------- STATE HELPERS ----------
+    def is_flooding(self, user_id, now):
+        history = self.user_flood_history.get(user_id)
+        if history is None:
+            history = deque(maxlen=self.FLOOD_LIMIT)
+        history.append(now)
+        # Re-set on every message: the entry lives TIME_WINDOW after the last one
+        self.user_flood_history.set(user_id, history)
+        return len(history) == self.FLOOD_LIMIT and now - history[0] < self.TIME_WINDOW
+
+    def get_warnings(self, user_id, now=None):
+        count, last = self.user_warnings.get(user_id, (0, 0))
+        decayed = int(((now or time.time()) - last) // self.WARNING_DECAY)
+        return max(count - decayed, 0)
+
+    def add_warning(self, user_id):
+        now = time.time()
+        count = self.get_warnings(user_id, now) + 1
+        self.user_warnings.set(user_id, (count, now), ttl=count * self.WARNING_DECAY)
+        return count
+
+    def mark_blocked(self, user_id):
+        self.blocked_cache.set(user_id, True)
+
+    def reset_user(self, user_id):
+        self.blocked_cache.pop(user_id)
+        self.user_flood_history.pop(user_id)
+        self.user_warnings.pop(user_id)
+
+    async def sweep(self, interval=60):
+        """Drop expired entries even for users who never come back."""
+        while True:
+            await asyncio.sleep(interval)
+            for cache in (self.user_flood_history, self.user_warnings, self.blocked_cache):
+                cache.expire()
         
     async def check_ban(self, client, m: Message):
         user_id = m.from_user.id
@@ -27,7 +72,7 @@ class BanManager:
             return True
         is_blocked = await db.is_user_blocked(user_id)
         if is_blocked:
-            self.blocked_cache[user_id] = True
+            self.mark_blocked(user_id)
             await self._send_block_msg(m)
             return True
         is_temp_banned, remaining = await db.is_temp_banned(user_id)
@@ -36,18 +81,14 @@ class BanManager:
                 f"🚫 <b>You are temporarily banned!</b>\n\n⏳ Wait: <code>{remaining}s</code>"
             )
             return True
-        history = self.user_flood_history.setdefault(user_id, [])
-        history.append(current_time)
-        history[:] = [t for t in history if current_time - t < self.TIME_WINDOW]
-        if len(history) >= self.FLOOD_LIMIT:
+        if self.is_flooding(user_id, current_time):
             await self.punish_user(client, m, user_id)
-            self.user_flood_history[user_id] = []
+            self.user_flood_history.pop(user_id)
             return True
         return False
 
     async def punish_user(self, client, m: Message, user_id: int):
-        self.user_warnings[user_id] = self.user_warnings.get(user_id, 0) + 1
-        warn_count = self.user_warnings[user_id]
+        warn_count = self.add_warning(user_id)
         user_link = m.from_user.mention
 
         try:
@@ -73,7 +114,7 @@ class BanManager:
 
         elif warn_count >= 5:
             await db.block_user(user_id, reason="Auto-Ban: Excessive Spam")
-            self.blocked_cache[user_id] = True
+            self.mark_blocked(user_id)
             await m.reply("🛑 <b>Permanent Ban!</b>\n\nGoodbye.")
             await client.send_message(LOG_CHANNEL, f"🛑 #Perm_Ban\n👤 {user_link}\n🆔 {user_id}")
 
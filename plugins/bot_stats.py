@@ -1,11 +1,11 @@
-import os
 import pytz
 from datetime import datetime
 from pyrogram import Client, filters
 from pyrogram.types import *
 from database.users_db import db
 from info import ADMINS, PREMIUM_DAILY_LIMIT, DAILY_LIMIT, VERIFICATION_DAILY_LIMIT
-from utils import get_size
+from utils import get_size, get_readable_time, ReportWriter
+from database.stats import stats_service
 from Script import script
 
 # ---------------------------------------------------------------------------------
@@ -14,13 +14,9 @@ from Script import script
 @Client.on_message(filters.command('stats') & filters.user(ADMINS) & filters.incoming)
 async def get_stats(bot, message: Message):
     aVBOTz = await message.reply("🔄 **Fetching stats...**")
-    total_users = await db.total_users_count()
-    premium_users = await db.premium_users_count()
-    mixfiles = await db.total_files_count()
-    brazzers = await db.total_brazzers_videos()
-    blocked = await db.total_blocked_count()
-    redeem = await db.total_redeem_count()
-    dbsize = await db.get_db_size()
+    # Served from the background snapshot (see database/stats.py)
+    stats = await stats_service.get()
+    dbsize = stats["dbsize"]
     freespace = 536870912 - dbsize 
     try:
         db_size_human = get_size(dbsize)
@@ -30,15 +26,15 @@ async def get_stats(bot, message: Message):
         free_space_human = await get_size(freespace)
     try:
         await aVBOTz.edit(script.STATS_TXT.format(
-            total_users=total_users,
-            premium_users=premium_users,
-            redeem=redeem,
-            blocked=blocked,
-            mixfiles=mixfiles,
-            brazzers=brazzers,
+            total_users=stats["total_users"],
+            premium_users=stats["premium_users"],
+            redeem=stats["redeem"],
+            blocked=stats["blocked"],
+            mixfiles=stats["mixfiles"],
+            brazzers=stats["brazzers"],
             db_size_human=db_size_human,
             free_space_human=free_space_human
-        ))
+        ) + f"\n\n<i>🕒 Updated {get_readable_time(int(stats_service.age)) or '0s'} ago</i>")
     except Exception as e:
         await aVBOTz.edit(f"❌ **Error in Stats Format:** {e}")
 
@@ -121,36 +117,26 @@ async def delete_callback_handler(client, callback: CallbackQuery):
 async def all_users_stats(client, message: Message):
     status_msg = await message.reply("🔄 **Fetching active users stats... Please wait.**")
 
-    users_cursor = db.users.find({})
-    report_list = []
+    # Rows stream into an in-memory file; only the first 10 stay in a list
+    report = ReportWriter(
+        "Active_Users_Stats.txt",
+        header="📊 ACTIVE USERS PLAN STATS REPORT\n=================================\n\n",
+        preview=10
+    )
     total_files_used = 0
     active_users_count = 0
 
-    async for user in users_cursor:
-        user_id = user.get("id", "N/A")
-        username = user.get("username")
-        username_display = f"@{username}" if username else "N/A"
+    # One server-side aggregation: plan + limit are computed by MongoDB
 
-        used = await db.get_video_count(user_id)
-        if used == 0:
-            continue
-
-        # -------- STATUS CHECK --------
-        is_premium = await db.has_premium_access(user_id)
-        is_verified = await db.is_user_verified(user_id)
-
-        # -------- LIMIT LOGIC --------
-        if is_premium:
-            daily_limit = PREMIUM_DAILY_LIMIT
-            subscription_type = "Paid"
-        elif is_verified:
-            daily_limit = VERIFICATION_DAILY_LIMIT
-            subscription_type = "Verified"
-        else:
-            daily_limit = DAILY_LIMIT
-            subscription_type = "Free"
+    async for row in db.daily_usage_report():
+        user_id = row.get("user_id", "N/A")
+        username = row.get("username")
+        username_display = f"@{username}" if username else "N/A"
 
-        remaining = max(daily_limit - used, 0)
+        used = row["used"]
+        daily_limit = row["daily_limit"]
+        subscription_type = row["plan"]
+        remaining = row["remaining"]
         total_files_used += used
 
         user_entry = (
@@ -160,8 +146,8 @@ async def all_users_stats(client, message: Message):
         )
 
         # -------- PREMIUM EXPIRY --------
-        expiry_time = user.get("expiry_time")
-        if is_premium and expiry_time:
+        expiry_time = row.get("expiry_time")
+        if expiry_time:
             try:
                 if isinstance(expiry_time, datetime):
                     expiry_dt = expiry_time.astimezone(pytz.timezone("Asia/Kolkata"))
@@ -171,7 +157,7 @@ async def all_users_stats(client, message: Message):
             except Exception as e:
                 print(f"Expiry date parse error for user {user_id}: {e}")
 
-        report_list.append(user_entry)
+        report.add_row(user_entry, separator="\n\n---------------------------------\n\n")
         active_users_count += 1
 
     summary_text = (
@@ -181,16 +167,11 @@ async def all_users_stats(client, message: Message):
 
     # -------- OUTPUT --------
     if active_users_count > 10:
-        file_path = "Active_Users_Stats.txt"
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("📊 ACTIVE USERS PLAN STATS REPORT\n")
-            f.write("=================================\n\n")
-            f.write("\n\n---------------------------------\n\n".join(report_list))
-            f.write("\n\n=================================\n")
-            f.write(summary_text)
-
-        await message.reply_document(
-            document=file_path,
+        report.write("=================================\n")
+        report.write(summary_text)
+
+        await report.reply(
+            message,
             caption=(
                 f"📊 **Active Users Report Generated**\n\n"
                 f"🧾 **Active Users:** `{active_users_count}`\n"
@@ -199,15 +180,12 @@ async def all_users_stats(client, message: Message):
             )
         )
 
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
     else:
         if active_users_count == 0:
             final_msg = "❌ No active users found (Usage = 0)."
         else:
             formatted_entries = []
-            for entry in report_list:
+            for entry in report.preview:
                 entry = entry.replace("User:", "**User:**").replace("Plan:", "`Plan:`")
                 formatted_entries.append(entry)
 
@@ -219,13 +197,9 @@ async def all_users_stats(client, message: Message):
             )
 
         if len(final_msg) > 4096:
-            with open("Stats.txt", "w", encoding="utf-8") as f:
-                f.write(final_msg.replace("**", "").replace("`", ""))
-
-            await message.reply_document("Stats.txt")
-
-            if os.path.exists("Stats.txt"):
-                os.remove("Stats.txt")
+            stats_file = ReportWriter("Stats.txt")
+            stats_file.write(final_msg.replace("**", "").replace("`", ""))
+            await stats_file.reply(message)
         else:
             await message.reply(final_msg)
 
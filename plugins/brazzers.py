@@ -1,28 +1,23 @@
-import asyncio
 import string
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database.users_db import db
-from info import LOG_CHANNEL, PREMIUM_DAILY_LIMIT, FSUB, PROTECT_CONTENT
-from utils import temp, auto_delete_message, is_user_joined
-from plugins.ban_manager import ban_manager 
+from info import LOG_CHANNEL, PREMIUM_DAILY_LIMIT, PROTECT_CONTENT
+from utils import temp, auto_delete_message
+from plugins.request_context import BRAZZERS, get_context
 
-@Client.on_message(filters.command("brazzers") | filters.regex(r"(?i)brazzers"))
+@Client.on_message(BRAZZERS)
 async def handle_brazzers_request(client, m: Message):
     if not m.from_user:
         return
-    if FSUB and not await is_user_joined(client, m):
-        return
     
+    # FSUB + ban gates already ran in the request middleware
     user_id = m.from_user.id
     username = m.from_user.username or m.from_user.first_name or "Unknown"
-    
-    if await ban_manager.check_ban(client, m):
-        return
 
     try:
-        is_premium = await db.has_premium_access(user_id)
-        if not is_premium:
+        ctx = await get_context(m)
+        if not ctx.is_premium:
             return await m.reply(
                 "💎 𝖡𝗎𝗒 𝖲𝗎𝖻𝗌𝖼𝗋𝗂𝗉𝗍𝗂𝗈𝗇 𝖠𝗇𝖽 𝖦𝖾𝗍 900+ 𝖡𝖺𝗋𝗓𝗓𝖾𝗋𝗌 𝖵𝗂𝖽𝖾𝗈 𝖯𝖾𝗋 𝖬𝗈𝗇𝗍𝗁.", 
                 reply_markup=InlineKeyboardMarkup([[
@@ -30,25 +25,35 @@ async def handle_brazzers_request(client, m: Message):
                 ]])
             )
 
-        used_today = await db.get_video_count(user_id)
-        if used_today >= PREMIUM_DAILY_LIMIT:
+        # Check + reserve today's slot in one atomic update
+        if await db.reserve_video_slot(user_id, username, PREMIUM_DAILY_LIMIT) is None:
             return await m.reply(f"⚠️ 𝖸𝗈𝗎'𝗏𝖾 𝖱𝖾𝖺𝖼𝗁𝖾𝖽 𝖸𝗈𝗎𝗋 𝖣𝖺𝗂𝗅𝗒 𝖫𝗂𝗆𝗂𝗍 𝖮𝖿 {PREMIUM_DAILY_LIMIT} 𝖥𝗂𝗅𝖾𝗌. 𝖳𝗋𝗒 𝖠𝗀𝖺𝗂𝗇 𝖳𝗈𝗆𝗈𝗋𝗋𝗈𝗐")
         
-        video_id = await db.get_unseen_brazzers(user_id)
-        if not video_id:
+        # Slot is already reserved -> any failure below must give it back
+        try:
+            video_id = await db.get_unseen_brazzers(user_id)
+            if not video_id:
+                video_id = await db.get_random_brazzers()
+
+            dlt = None
+            if video_id:
+                # Fix: Using client.send_video to support protect_content
+                dlt = await client.send_video(
+                    chat_id=m.chat.id,
+                    video=video_id,
+                    protect_content=PROTECT_CONTENT,
+                    caption=f"𝘗𝘰𝘸𝘦𝘳𝘦𝘥 𝘉𝘺: {temp.B_LINK}\n\n<blockquote>ᴛʜɪꜱ ꜰɪʟᴇ ᴡɪʟʟ ʙᴇ ᴀᴜᴛᴏ ᴅᴇʟᴇᴛᴇ ᴀꜰᴛᴇʀ 10 ᴍɪɴᴜᴛᴇꜱ. ᴘʟᴇᴀꜱᴇ ꜰᴏʀᴡᴀʀᴅ ᴛʜɪꜱ ꜰɪʟᴇ ꜱᴏᴍᴇᴡʜᴇʀᴇ ᴇʟꜱᴇ ᴏʀ ꜱᴀᴠᴇ ɪɴ ꜱᴀᴠᴇᴅ ᴍᴇꜱꜱᴀɢᴇꜱ.</blockquote>",
+                    reply_to_message_id=m.id
+                )
+        except Exception:
+            await db.release_video_slot(user_id)
+            raise
+
+        if not dlt:
+            await db.release_video_slot(user_id)
             return await m.reply("❌ No unseen videos found!")
 
-        # Fix: Using client.send_video to support protect_content
-        dlt = await client.send_video(
-            chat_id=m.chat.id,
-            video=video_id,
-            protect_content=PROTECT_CONTENT,
-            caption=f"𝘗𝘰𝘸𝘦𝘳𝘦𝘥 𝘉𝘺: {temp.B_LINK}\n\n<blockquote>ᴛʜɪꜱ ꜰɪʟᴇ ᴡɪʟʟ ʙᴇ ᴀᴜᴛᴏ ᴅᴇʟᴇᴛᴇ ᴀꜰᴛᴇʀ 10 ᴍɪɴᴜᴛᴇꜱ. ᴘʟᴇᴀꜱᴇ ꜰᴏʀᴡᴀʀᴅ ᴛʜɪꜱ ꜰɪʟᴇ ꜱᴏᴍᴇᴡʜᴇʀᴇ ᴇʟꜱᴇ ᴏʀ ꜱᴀᴠᴇ ɪɴ ꜱᴀᴠᴇᴅ ᴍᴇꜱꜱᴀɢᴇꜱ.</blockquote>",
-            reply_to_message_id=m.id
-        )
-        
-        await db.increase_video_count(user_id, username)
-        asyncio.create_task(auto_delete_message(m, dlt))
+        await auto_delete_message(m, dlt)
 
     except Exception as e:
         print(f"Error: {e}")
@@ -3,22 +3,47 @@ from pyrogram.types import (
     InlineKeyboardButton, InlineKeyboardMarkup,
     ReplyKeyboardMarkup, ReplyKeyboardRemove
 )
-from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
 import time
+from datetime import datetime, timezone
 import asyncio
 import logging
 from database.users_db import db
 from info import ADMINS
-from utils import temp, get_readable_time, users_broadcast
+from utils import get_readable_time
+from plugins.broadcast_engine import BroadcastEngine, scan_dead_users
+from plugins.job_queue import JobQueue, edit_job_status
 
-lock = asyncio.Lock()
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+SEGMENTS = {
+    "all": "All users",
+    "premium": "Premium users",
+    "active": "Active in the last {days} days",
+    "verified": "Currently verified users",
+    "free": "Free (non-premium) users",
+    "inactive": "Never requested a video",
+}
 
 @Client.on_message(filters.command("broadcast") & filters.user(ADMINS) & filters.reply)
 async def broadcast_users(bot, message):
-    if lock.locked():
-        return await message.reply('Currently broadcast processing, Wait for complete.')
+    # /broadcast [segment] [days]
+    segment = message.command[1].lower() if len(message.command) > 1 else "all"
+    days = None
+    if segment not in SEGMENTS:
+        return await message.reply_text(
+            "❗ Usage: <code>/broadcast [segment] [days]</code>\n\n"
+            "Segments: " + ", ".join(f"<code>{s}</code>" for s in SEGMENTS)
+        )
+    if segment == "active":
+        days = int(message.command[2]) if len(message.command) > 2 and message.command[2].isdigit() else 7
+    segment_at = datetime.now(timezone.utc)
+    estimate = await db.count_segment(segment, days, segment_at)
+    if not estimate:
+        return await message.reply_text("⚠️ No users in this segment.")
 
     ask_pin = await message.reply(
+        f'<b>🎯 Audience: {SEGMENTS[segment].format(days=days)} (~{estimate} users)</b>\n\n'
         '<b>Do you want to pin this message in users?</b>',
         reply_markup=ReplyKeyboardMarkup([['Yes', 'No']], one_time_keyboard=True, resize_keyboard=True)
     )
@@ -40,58 +65,152 @@ async def broadcast_users(bot, message):
     await ask_pin.delete()
     await bot.send_message(chat_id=message.chat.id, text="Broadcast started...", reply_markup=ReplyKeyboardRemove())
 
-    users = await db.get_all_users()
-    b_msg = message.reply_to_message
-    b_sts = await message.reply_text(text='<b>ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ ʏᴏᴜʀ ᴍᴇssᴀɢᴇs ᴛᴏ ᴜsᴇʀs ⌛️</b>')
+    queued = await db.broadcast_job_store.count_queued()
+    b_sts = await message.reply_text(
+        text='<b>ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ ʏᴏᴜʀ ᴍᴇssᴀɢᴇs ᴛᴏ ᴜsᴇʀs ⌛️</b>' if not queued else
+        f'<b>⏳ Broadcast queued (position {queued + 1}). It will start automatically.</b>'
+    )
+
+    # Stored in Mongo -> survives restarts, resumes from its checkpoint
+    await db.create_broadcast_job(
+        source_chat=message.chat.id,
+        source_msg=message.reply_to_message.id,
+        is_pin=is_pin,
+        total=estimate,
+        status_chat=b_sts.chat.id,
+        status_msg=b_sts.id,
+        segment=segment,
+        days=days,
+        segment_at=segment_at
+    )
+    broadcast_queue.wake()
+
+@Client.on_message(filters.command("broadcast_check") & filters.user(ADMINS))
+async def broadcast_dry_run(bot, message):
+    """Estimate dead users before a broadcast (nothing is sent or deleted)."""
+    sts = await message.reply_text("🔎 <b>Checking stored users...</b>")
+    total = await db.total_users_count()
+    last_edit = 0
+
+    async def show_progress(result):
+        nonlocal last_edit
+        if time.time() - last_edit < 10:
+            return
+        last_edit = time.time()
+        try:
+            await sts.edit(f"🔎 <b>Checking stored users...</b>\n\nChecked: <code>{result['checked']}/{total}</code>")
+        except Exception:
+            pass
 
     start_time = time.time()
-    total_users = await db.total_users_count()
-    done = 0
-    success = 0
-    failed = 0
-
-    async with lock:
-        async for user in users:
-            if temp.USERS_CANCEL:
-                temp.USERS_CANCEL = False
-                time_taken = get_readable_time(time.time() - start_time)
-                await b_sts.edit(
-                    f"❌ Users broadcast cancelled!\nCompleted in {time_taken}\n\n"
-                    f"Total Users: <code>{total_users}</code>\n"
-                    f"Completed: <code>{done}</code>\n"
-                    f"Success: <code>{success}</code>"
-                )
-                return
-
-            success_flag, sts = await users_broadcast(int(user['id']), b_msg, is_pin)
-            if sts == 'Success':
-                success += 1
-            elif sts == 'Error':
-                failed += 1
-            done += 1
-
-            if done % 20 == 0:
-                btn = [[InlineKeyboardButton('CANCEL', callback_data='broadcast_cancel#users')]]
-                await b_sts.edit(
-                    f"📢 Users broadcast in progress...\n\n"
-                    f"Total Users: <code>{total_users}</code>\n"
-                    f"Completed: <code>{done}</code>\n"
-                    f"Success: <code>{success}</code>",
-                    reply_markup=InlineKeyboardMarkup(btn)
-                )
-
-        time_taken = get_readable_time(time.time() - start_time)
-        await b_sts.edit(
-            f"✅ Users broadcast completed!\nCompleted in {time_taken}\n\n"
-            f"Total Users: <code>{total_users}</code>\n"
-            f"Completed: <code>{done}</code>\n"
-            f"Success: <code>{success}</code>\n"
-            f"Failed: <code>{failed}</code>"
-        )
+    result = await scan_dead_users(bot, on_progress=show_progress)
+    likely_dead = result["deleted"] + result["unresolved"]
+    await sts.edit(
+        f"🧪 <b>Broadcast dry run</b> ({get_readable_time(time.time() - start_time)})\n\n"
+        f"Checked: <code>{result['checked']}</code>\n"
+        f"Deleted accounts: <code>{result['deleted']}</code>\n"
+        f"Unresolvable ids: <code>{result['unresolved']}</code>\n"
+        f"Likely dead: <code>{likely_dead}</code> "
+        f"({(likely_dead / result['checked'] * 100) if result['checked'] else 0:.1f}%)\n\n"
+        f"<i>Users who blocked the bot show up only during a real broadcast.</i>"
+    )
+
+@Client.on_message(filters.command("restore_user") & filters.user(ADMINS))
+async def restore_pruned_user(bot, message):
+    if len(message.command) != 2 or not message.command[1].isdigit():
+        return await message.reply_text("❗ Usage: <code>/restore_user user_id</code>")
+    if await db.restore_user(int(message.command[1])):
+        await message.reply_text("✅ User restored from the archive.")
+    else:
+        await message.reply_text("⚠️ No archived copy of this user.")
 
 @Client.on_callback_query(filters.regex(r'^broadcast_cancel'))
 async def broadcast_cancel(bot, query):
-    _, ident = query.data.split("#")
-    if ident == 'users':
+    _, job_id = query.data.split("#")
+    if await broadcast_queue.cancel(job_id):
         await query.message.edit("ᴛʀʏɪɴɢ ᴛᴏ ᴄᴀɴᴄᴇʟ ᴜsᴇʀs ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ...")
-        temp.USERS_CANCEL = True
+    else:
+        await query.answer("⚠️ Broadcast already finished.", show_alert=True)
+
+# =================================================
+# 📢 BROADCAST JOB RUNNER
+# =================================================
+async def run_broadcast_job(job, bot, resumed=False):
+    job_id = job["_id"]
+    total_users = job["total"]
+    btn = InlineKeyboardMarkup([[InlineKeyboardButton('CANCEL', callback_data=f'broadcast_cancel#{job_id}')]])
+
+    try:
+        b_msg = await bot.get_messages(job["source_chat"], job["source_msg"])
+    except Exception as e:
+        b_msg = None
+        logger.error(f"Broadcast source message missing for job {job_id}: {e}")
+    if not b_msg or b_msg.empty:
+        await db.broadcast_job_store.set_status(job_id, "failed")
+        return await edit_job_status(bot, job, "❌ Broadcast failed: source message was deleted.")
+
+    if resumed:
+        await edit_job_status(bot, job, "<b>🔁 Users broadcast resumed after restart...</b>", btn)
+
+    engine = BroadcastEngine()
+
+    async def user_items():
+        cursor, id_field = db.get_segment_ids_after(
+            job.get("segment", "all"), job.get("days"), job.get("segment_at"), job.get("checkpoint")
+        )
+        async for user in cursor:
+            yield user["_id"], int(user[id_field])
+
+    def counters(stats):
+        return {k: stats[k] for k in ("done", "success", "blocked", "deleted", "failed")}
+
+    async def show_progress(stats):
+        await db.broadcast_job_store.save_checkpoint(job_id, stats["checkpoint"], counters(stats))
+        eta = engine.eta(stats)
+        await edit_job_status(
+            bot, job,
+            f"📢 Users broadcast in progress...\n\n"
+            f"Total Users: <code>{total_users}</code>\n"
+            f"Completed: <code>{stats['done']}</code>\n"
+            f"Success: <code>{stats['success']}</code>\n"
+            f"Failed: <code>{stats['failed'] + stats['blocked'] + stats['deleted']}</code>\n"
+            f"ETA: <code>{get_readable_time(int(eta)) if eta else 'calculating...'}</code>",
+            btn
+        )
+
+    stats = await engine.run(
+        user_items(), b_msg, job["is_pin"], total_users,
+        on_progress=show_progress,
+        cancelled=lambda: broadcast_queue.is_cancelled(job_id),
+        counters=job.get("counters"),
+        checkpoint=job.get("checkpoint")
+    )
+    await db.broadcast_job_store.save_checkpoint(job_id, stats["checkpoint"], counters(stats))
+
+    time_taken = get_readable_time(time.time() - stats["start_time"])
+    if stats["cancelled"]:
+        return await edit_job_status(
+            bot, job,
+            f"❌ Users broadcast cancelled!\nCompleted in {time_taken}\n\n"
+            f"Total Users: <code>{total_users}</code>\n"
+            f"Completed: <code>{stats['done']}</code>\n"
+            f"Success: <code>{stats['success']}</code>"
+        )
+
+    await db.broadcast_job_store.set_status(job_id, "done")
+    await edit_job_status(
+        bot, job,
+        f"✅ Users broadcast completed!\nCompleted in {time_taken}\n\n"
+        f"Total Users: <code>{total_users}</code>\n"
+        f"Completed: <code>{stats['done']}</code>\n"
+        f"Success: <code>{stats['success']}</code>\n"
+        f"Blocked: <code>{stats['blocked']}</code>\n"
+        f"Deleted: <code>{stats['deleted']}</code>\n"
+        f"Failed: <code>{stats['failed']}</code>\n"
+        f"Pruned from DB: <code>{stats['pruned']}</code>"
+    )
+
+broadcast_queue = JobQueue(db.broadcast_job_store, run_broadcast_job, "Broadcast")
+
+def start_broadcast_worker(bot):
+    broadcast_queue.start(bot)
@@ -0,0 +1,234 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from pyrogram.errors import FloodWait
+from utils import users_broadcast
+from database.users_db import db
+from info import BROADCAST_RATE, BROADCAST_WORKERS, BROADCAST_PROGRESS_INTERVAL, PRUNE_BATCH_SIZE
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+
+# -------------------- GLOBAL RATE GOVERNOR --------------------
+class RateGovernor:
+    """
+    Token bucket shared by every broadcast worker: at most `rate` API calls
+    per second (bursts up to `capacity`). A FloodWait from any worker pauses
+    the whole bucket, so nobody keeps hammering Telegram while one waits.
+    """
+
+    def __init__(self, rate=BROADCAST_RATE, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.resume_at = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+        self.tokens = 0
+        logger.warning(f"Broadcast FloodWait: all workers paused for {seconds}s")
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    await asyncio.sleep(self.resume_at - now)
+                    self.updated = time.monotonic()
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# -------------------- DEAD USER PRUNER --------------------
+class DeadUserPruner:
+    """
+    Collects users that blocked the bot / were deleted during a broadcast and
+    removes them with one archived delete_many per `batch_size` ids, instead
+    of one write per user inside the send loop.
+    """
+
+    def __init__(self, batch_size=PRUNE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.pending = []
+        self.pruned = 0
+        self._tasks = set()
+
+    def add(self, user_id, reason):
+        self.pending.append((user_id, reason))
+        if len(self.pending) >= self.batch_size:
+            task = asyncio.ensure_future(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        entries, self.pending = self.pending, []
+        if not entries:
+            return
+        try:
+            self.pruned += await db.prune_users(entries)
+        except Exception as e:
+            logger.error(f"Pruning {len(entries)} dead users failed: {e}")
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+
+# -------------------- BROADCAST ENGINE --------------------
+class BroadcastEngine:
+    """
+    Sends one message to many users with a bounded worker pool behind the
+    RateGovernor. `on_progress(stats)` is called every `progress_interval`
+    seconds (and never per user), `cancelled()` is polled between users.
+
+    Items are (key, user_id) pairs in ascending key order. Workers finish out
+    of order, so `stats["checkpoint"]` is the highest key below which every
+    item is done: resuming after it never re-sends a finished user.
+    """
+
+    def __init__(self, workers=BROADCAST_WORKERS, rate=BROADCAST_RATE, progress_interval=BROADCAST_PROGRESS_INTERVAL):
+        self.workers = workers
+        self.governor = RateGovernor(rate)
+        self.progress_interval = progress_interval
+
+    @staticmethod
+    def eta(stats):
+        """Seconds left at the speed measured so far (None until measurable)."""
+        elapsed = time.time() - stats["start_time"]
+        sent_now = stats["done"] - stats["resumed"]
+        if not sent_now or elapsed <= 0:
+            return None
+        speed = sent_now / elapsed
+        return max(stats["total"] - stats["done"], 0) / speed
+
+    async def run(self, items, message, is_pin, total, on_progress=None, cancelled=None, counters=None, checkpoint=None):
+        """
+        `items` is an async iterable of (key, user_id), e.g. a Mongo cursor.
+        `counters` / `checkpoint` continue a resumed job.
+        """
+        stats = {"done": 0, "success": 0, "blocked": 0, "deleted": 0, "failed": 0}
+        stats.update(counters or {})
+        stats.update({
+            "total": total, "resumed": stats["done"], "checkpoint": checkpoint,
+            "start_time": time.time(), "cancelled": False,
+        })
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        pruner = DeadUserPruner()
+        inflight = OrderedDict()   # key -> finished? (dispatch order)
+
+        def finish(key):
+            inflight[key] = True
+            while inflight and next(iter(inflight.values())):
+                stats["checkpoint"], _ = inflight.popitem(last=False)
+
+        async def producer():
+            try:
+                async for key, user_id in items:
+                    if stats["cancelled"] or (cancelled and cancelled()):
+                        stats["cancelled"] = True
+                        break
+                    inflight[key] = False
+                    await queue.put((key, user_id))
+            finally:
+                for _ in range(self.workers):
+                    await queue.put(None)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if stats["cancelled"] or (cancelled and cancelled()):
+                    # Drain the queue without sending
+                    stats["cancelled"] = True
+                    continue
+                key, user_id = item
+                _, sts = await users_broadcast(user_id, message, is_pin, governor=self.governor, pruner=pruner)
+                if sts == "Success":
+                    stats["success"] += 1
+                elif sts == "Blocked":
+                    stats["blocked"] += 1
+                elif sts == "Deleted":
+                    stats["deleted"] += 1
+                else:
+                    stats["failed"] += 1
+                stats["done"] += 1
+                finish(key)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                try:
+                    await pruner.flush()
+                    await on_progress(stats)
+                except Exception as e:
+                    logger.warning(f"Broadcast progress update failed: {e}")
+
+        progress_task = asyncio.create_task(reporter()) if on_progress else None
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(self.workers)))
+        finally:
+            if progress_task:
+                progress_task.cancel()
+            await pruner.close()
+        stats["pruned"] = pruner.pruned
+        return stats
+
+
+# -------------------- DRY RUN --------------------
+async def scan_dead_users(bot, governor=None, batch_size=200, on_progress=None):
+    """
+    Pre-broadcast estimate without sending anything: resolves every stored
+    user with get_users (200 ids per call) and counts deleted accounts and
+    ids Telegram no longer resolves. Users who blocked the bot can only be
+    detected by an actual send, so this is a lower bound.
+    """
+    governor = governor or RateGovernor()
+    result = {"checked": 0, "deleted": 0, "unresolved": 0}
+
+    async def resolve(ids):
+        while True:
+            await governor.acquire()
+            try:
+                return await bot.get_users(ids)
+            except FloodWait as e:
+                governor.pause(e.value)
+
+    async def check(ids):
+        try:
+            users = await resolve(ids)
+        except Exception:
+            if len(ids) == 1:
+                result["unresolved"] += 1
+                return
+            # One bad id fails the whole call -> retry one by one
+            for user_id in ids:
+                await check([user_id])
+            return
+        users = users if isinstance(users, list) else [users]
+        result["deleted"] += sum(1 for u in users if u.is_deleted)
+        result["unresolved"] += len(ids) - len(users)
+
+    batch = []
+    async for user in db.users.find({}, {"id": 1, "_id": 0}):
+        batch.append(int(user["id"]))
+        if len(batch) >= batch_size:
+            await check(batch)
+            result["checked"] += len(batch)
+            batch = []
+            if on_progress:
+                await on_progress(result)
+    if batch:
+        await check(batch)
+        result["checked"] += len(batch)
+    return result
@@ -3,7 +3,7 @@ import asyncio
 import random
 import string
 import hashlib
-import re, os
+import re
 import pytz
 from datetime import datetime, timedelta, timezone
 from os import environ
@@ -11,7 +11,8 @@ from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from info import ADMINS, PREMIUM_LOGS
 from database.users_db import db
-from utils import temp, get_seconds
+from utils import temp, get_seconds, ReportWriter
+from plugins.request_context import REDEEM, REDEEM_CODE, get_context
 
 # ==================================================================
 # 🔑 CODE GENERATOR LOGIC
@@ -75,64 +76,55 @@ async def generate_code_cmd(client, message):
 @Client.on_message(filters.command("allcodes") & filters.user(ADMINS))
 async def all_codes_cmd(client, message):
     msg_status = await message.reply_text("🔄 **Fetching codes...**")
-    all_codes = await db.codes.find({}).to_list(length=None)
-    if not all_codes:
-        return await msg_status.edit("⚠️ No codes found.")
-    if len(all_codes) > 10:
-        file_path = "All_Redeem_Codes.txt"
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write("📝 GENERATED REDEEM CODES LIST\n")
-            f.write("================================\n\n")
-            for code in all_codes:
-                status = "Yes" if code.get("used") else "No"
-                created_at = code.get("created_at")
-                if created_at:
-                    if created_at.tzinfo is None:
-                        created_at = created_at.replace(tzinfo=timezone.utc)
-                    created = created_at.astimezone(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y %I:%M %p")
-                else:
-                    created = "N/A"
 
-                user_id = code.get("user_id")
-                user_text = str(user_id) if user_id else "Not Redeemed"
-                f.write(f"🔑 Code: {code['original_code']}\n")
-                f.write(f"⌛ Duration: {code['duration']}\n")
-                f.write(f"‼️ Used: {status}\n")  # Fixed: Added f.write(
-                f.write(f"🕓 Created: {created}\n") # Fixed: Added f.write(
-                f.write(f"🙎 User ID: {user_text}\n") # Fixed: Added f.write(
-                f.write("--------------------------------\n")
+    # Stream the cursor into an in-memory file, keep only 10 codes for the chat view
+    report = ReportWriter(
+        "All_Redeem_Codes.txt",
+        header="📝 GENERATED REDEEM CODES LIST\n================================\n\n",
+        preview=10
+    )
+    async for code in db.codes.find({}):
+        status = "Yes" if code.get("used") else "No"
+        created_at = code.get("created_at")
+        if created_at:
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            created = created_at.astimezone(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y %I:%M %p")
+        else:
+            created = "N/A"
+
+        user_id = code.get("user_id")
+        user_text = str(user_id) if user_id else "Not Redeemed"
+        report.add_row(
+            f"🔑 Code: {code['original_code']}\n"
+            f"⌛ Duration: {code['duration']}\n"
+            f"‼️ Used: {status}\n"
+            f"🕓 Created: {created}\n"
+            f"🙎 User ID: {user_text}\n"
+            f"--------------------------------",
+            preview_text=(
+                f"🔑 Code: <code>{code['original_code']}</code>\n"
+                f"⌛ Duration: {code['duration']}\n"
+                f"‼️ Used: {status} {'✅' if code.get('used') else '⭕'}\n"
+                f"🕓 Created: {created}\n"
+                f"🙎 User: {f'<code>{user_id}</code>' if user_id else user_text}\n\n"
+                f"──────────────────\n\n"
+            )
+        )
+
+    if not report.rows:
+        return await msg_status.edit("⚠️ No codes found.")
+    if report.rows > 10:
         try:
-            await message.reply_document(
-                document=file_path,
-                caption=f"📝 **Total Generated Codes:** `{len(all_codes)}`\n\nℹ️ _File sent because codes are more than 10._"
+            await report.reply(
+                message,
+                caption=f"📝 **Total Generated Codes:** `{report.rows}`\n\nℹ️ _File sent because codes are more than 10._"
             )
         except Exception as e:
             await message.reply_text(f"❌ Error sending file: {e}")
-        if os.path.exists(file_path):
-            os.remove(file_path)
         await msg_status.delete()
     else:
-        msg = "📝 <b>GENERATED CODES DETAILS:</b>\n\n"
-        for code in all_codes:
-            status = "Yes ✅" if code.get("used") else "No ⭕"
-            created_at = code.get("created_at")
-            if created_at:
-                if created_at.tzinfo is None:
-                    created_at = created_at.replace(tzinfo=timezone.utc)
-                created = created_at.astimezone(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y %I:%M %p")
-            else:
-                created = "N/A"
-            user_id = code.get("user_id")
-            user_text = f"<code>{user_id}</code>" if user_id else "Not Redeemed"
-            msg += (
-                f"🔑 Code: <code>{code['original_code']}</code>\n"
-                f"⌛ Duration: {code['duration']}\n"
-                f"‼️ Used: {status}\n"
-                f"🕓 Created: {created}\n"
-                f"🙎 User: {user_text}\n\n"
-                f"──────────────────\n\n"
-            )
-        await msg_status.edit(msg)
+        await msg_status.edit("📝 <b>GENERATED CODES DETAILS:</b>\n\n" + "".join(report.preview))
         
 
 # ------------------------------------------------------------------
@@ -163,16 +155,12 @@ async def clear_codes_cmd(client, message):
 # ------------------------------------------------------------------
 # 🎁 USER COMMAND: REDEEM
 # ------------------------------------------------------------------
-@Client.on_message(filters.command("redeem"))
+@Client.on_message(REDEEM)
 async def redeem_command(client, message):
-    user_id = message.from_user.id
-    
-    if await db.has_premium_access(user_id):
-        return await message.reply_text("𝖸𝗈𝗎 𝖠𝗅𝗋𝖾𝖺𝖽𝗒 𝖯𝗎𝗋𝖼𝗁𝖺𝗌𝖾𝖽 𝖮𝗎𝗋 𝖲𝗎𝖻𝗌𝖼𝗋𝗂𝗉𝗍𝗂𝗈𝗇! 𝖤𝗇𝗃𝗈𝗒 𝖸𝗈𝗎𝗋 𝖡𝖾𝗇𝖾𝖿𝗂𝗍𝗌..")
-    
     if len(message.command) != 2:
         return await message.reply_text("Usage: `/redeem CODE`")
     
+    # Premium check happens once, inside redeem_code_handler (from the request context)
     code = message.command[1].strip().upper()
     message.text = code
     await redeem_code_handler(client, message)
@@ -180,13 +168,13 @@ async def redeem_command(client, message):
 # ------------------------------------------------------------------
 # 🕵️ REGEX HANDLER FOR REDEEM CODES
 # ------------------------------------------------------------------
-@Client.on_message(filters.regex(r"^PWZONE[A-Z0-9]{10}$"))
+@Client.on_message(REDEEM_CODE)
 async def redeem_code_handler(client, message):
     code = message.text.strip().upper()
     user_id = message.from_user.id
     user_name = message.from_user.first_name
 
-    if await db.has_premium_access(user_id):
+    if (await get_context(message)).is_premium:
         return await message.reply_text("𝖸𝗈𝗎 𝖠𝗅𝗋𝖾𝖺𝖽𝗒 𝖯𝗎𝗋𝖼𝗁𝖺𝗌𝖾𝖽 𝖮𝗎𝗋 𝖲𝗎𝖻𝗌𝖼𝗋𝗂𝗉𝗍𝗂𝗈𝗇!")
 
     code_data = await db.codes.find_one({"code_hash": hash_code(code)})
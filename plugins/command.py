@@ -5,23 +5,22 @@ from pyrogram.types import *
 from pyrogram.errors import *
 from Script import script
 from database.users_db import db
-from info import START_PIC, LOG_CHANNEL, PREMIUM_LOGS, FSUB, QR_CODE_IMAGE, DAILY_LIMIT, PREMIUM_DAILY_LIMIT, UPI_ID
-from utils import temp, is_user_joined
+from info import START_PIC, LOG_CHANNEL, PREMIUM_LOGS, QR_CODE_IMAGE, DAILY_LIMIT, PREMIUM_DAILY_LIMIT, UPI_ID
+from utils import temp
 from plugins.verification import verify_user_on_start
 from plugins.send_file import send_requested_file
 from plugins.refer import refer_on_start
+from plugins.request_context import START
 
 # =================================================
 # 🚀 START COMMAND
 # =================================================
-@Client.on_message(filters.command("start") & filters.private)
+@Client.on_message(START)
 async def start_command(client, message: Message):
+    # FSUB gate already ran in the request middleware
     user_id = message.from_user.id
     mention = message.from_user.mention
     me2 = (await client.get_me()).mention
-    
-    if FSUB and not await is_user_joined(client, message):
-        return
         
     argument = message.command[1] if len(message.command) > 1 else None
 
@@ -123,7 +122,9 @@ async def send_about_text(client, message):
 # =========================================================
 # 🔙 CALLBACK QUERY HANDLER
 # =========================================================
-@Client.on_callback_query()
+# Only its own buttons: plugins loading after command.py (index#, add_prem_, ...)
+# register their callbacks in the same group and would never be reached.
+@Client.on_callback_query(filters.regex(r"^(close_data|get)$"))
 async def cb_handler(client: Client, query: CallbackQuery):
     data = query.data
     user_id = query.from_user.id
@@ -1,28 +1,44 @@
 import asyncio
 import time
+import logging
+from collections import deque
+from contextlib import aclosing
 from pyrogram import Client, filters, enums
 from pyrogram.errors import FloodWait, ChannelInvalid, ChatAdminRequired
+from pymongo.errors import PyMongoError
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
-from info import ADMINS, VIDEO_CHANNEL
+from info import ADMINS, VIDEO_CHANNEL, BRAZZER_CHANNEL, INDEX_BATCH_SIZE, INDEX_CONCURRENCY
 from database.users_db import db  
-from utils import temp, get_progress_bar, get_readable_time
+from utils import get_progress_bar, get_readable_time
+from plugins.job_queue import JobQueue, edit_job_status
 
-lock = asyncio.Lock()
+logger = logging.getLogger(__name__)
 
-# Temporary Storage for Index Data
+# Temporary Storage for Index Data (only while the admin answers the questions)
 INDEX_CACHE = {}
 
+# Seconds between progress message edits
+PROGRESS_INTERVAL = 5
+
 # =================================================
 # 📥 CALLBACK QUERY HANDLER (Fixed)
 # =================================================
 @Client.on_callback_query(filters.regex(r'^index'))
 async def index_files(bot, query):
-    action = query.data.split("#")[1] # yes, start_main, start_brazzers, cancel
+    parts = query.data.split("#")
+    action = parts[1] # yes, start_main, start_brazzers, cancel, stop
     user_id = query.from_user.id
 
+    # Stop a queued / running job
+    if action == 'stop':
+        if await index_queue.cancel(parts[2]):
+            await query.answer("🛑 Cancelling...")
+        else:
+            await query.answer("⚠️ Job already finished.", show_alert=True)
+        return
+
     # Cancel Action
     if action == 'cancel':
-        temp.CANCEL = True
         # Clear cache if exists
         if user_id in INDEX_CACHE:
             del INDEX_CACHE[user_id]
@@ -62,24 +78,28 @@ async def index_files(bot, query):
     elif action.startswith('start_'):
         target_db = action.replace('start_', '') # 'main' or 'brazzers'
         db_name = "Brazzers" if target_db == "brazzers" else "Main Video"
-        
-        await query.message.edit(f"<b>🚀 {db_name} Indexing started from ID: {skip}...</b>")
-        
-        # Start Indexing
-        await index_files_to_db(lst_msg_id, chat, query.message, bot, skip, target_db)
-        
-        # Cleanup Cache after finish
-        if user_id in INDEX_CACHE:
-            del INDEX_CACHE[user_id]
+
+        # Job is stored in DB -> survives restarts, resumes from its checkpoint
+        ahead = await db.index_job_store.count_queued()
+        job = await db.create_index_job(
+            chat, data.get('title'), lst_msg_id, skip, target_db,
+            query.message.chat.id, query.message.id
+        )
+        del INDEX_CACHE[user_id]
+
+        btn = [[InlineKeyboardButton('CANCEL', callback_data=f"index#stop#{job['_id']}")]]
+        await query.message.edit(
+            f"<b>📥 {db_name} Indexing queued from ID: {skip}...</b>\n"
+            f"⏳ Jobs ahead: <code>{ahead}</code>",
+            reply_markup=InlineKeyboardMarkup(btn)
+        )
+        index_queue.wake()
 
 # =================================================
 # 📥 COMMAND HANDLER (/index)
 # =================================================
 @Client.on_message(filters.command('index') & filters.private & filters.incoming & filters.user(ADMINS))
 async def send_for_index(bot, message):
-    if lock.locked():
-        return await message.reply('⚠️ Wait until previous process completes.')
-        
     i = await message.reply("Forward last message from channel OR send last message link.")
     try:
         msg = await bot.listen(chat_id=message.chat.id, user_id=message.from_user.id)
@@ -130,6 +150,7 @@ async def send_for_index(bot, message):
     # ----------------------------------------------------
     INDEX_CACHE[message.from_user.id] = {
         'chat': chat.id,
+        'title': chat.title,
         'lst_msg_id': last_msg_id,
         'skip': skip
     }
@@ -151,132 +172,225 @@ async def send_for_index(bot, message):
     )
 
 # =================================================
-# ⚙️ MAIN INDEXING LOGIC (Same as before)
+# 🚚 PIPELINED MESSAGE FETCHER
 # =================================================
-async def index_files_to_db(lst_msg_id, chat, msg, bot, skip, target_db):
-    start_time = time.time()
-    total_files = 0
-    duplicate = 0
-    errors = 0
-    deleted = 0
-    no_media = 0
-    unsupported = 0
-    current = skip + 1 
-    BATCH_SIZE = 20
-
-    async with lock:
-        try:
-            temp.CANCEL = False
-            
-            while current <= lst_msg_id:
-                
-                if temp.CANCEL:
-                    time_taken = get_readable_time(time.time()-start_time)
-                    await msg.edit(f"🛑 Indexing Cancelled!\n⏱ Time: {time_taken}\n✅ Saved: {total_files}")
-                    return
+class FetchPipeline:
+    """
+    Keeps up to `concurrency` get_messages calls (200 ids each) in flight
+    ahead of the consumer, so DB writes of one batch overlap with fetching
+    the next ones. Batches are still yielded in order.
+
+    FloodWait pauses every fetch and widens the gap between calls; the gap
+    shrinks back on each successful call.
+    """
+
+    def __init__(self, bot, chat, batch_size=INDEX_BATCH_SIZE, concurrency=INDEX_CONCURRENCY):
+        self.bot = bot
+        self.chat = chat
+        self.batch_size = min(max(batch_size, 1), 200)
+        self.concurrency = max(concurrency, 1)
+        self.delay = 0.0
+        self.pause_until = 0.0
+        self.flood_waits = 0
+        self._next_start = 0.0
+        self._slot = asyncio.Lock()
 
-                end_id = min(current + BATCH_SIZE, lst_msg_id + 1)
-                ids = list(range(current, end_id))
-                
-                if not ids:
-                    break
+    async def _throttle(self):
+        async with self._slot:
+            wait = max(self.pause_until, self._next_start) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start = time.monotonic() + self.delay
 
+    async def _fetch(self, ids):
+        for _ in range(5):
+            await self._throttle()
+            try:
+                messages = await self.bot.get_messages(self.chat, ids)
+                self.delay = self.delay * 0.9 if self.delay > 0.05 else 0.0
+                return messages
+            except FloodWait as e:
+                self.flood_waits += 1
+                self.pause_until = max(self.pause_until, time.monotonic() + e.value)
+                self.delay = min(max(self.delay * 2, 0.5), 10)
+        raise RuntimeError("Too many FloodWaits")
+
+    async def batches(self, first_id, last_id):
+        """Yield (ids, messages) in order; messages is the Exception on failure."""
+        pending = deque()
+        current = first_id
+
+        def schedule():
+            nonlocal current
+            ids = list(range(current, min(current + self.batch_size, last_id + 1)))
+            current += len(ids)
+            pending.append((ids, asyncio.ensure_future(self._fetch(ids))))
+
+        try:
+            while current <= last_id and len(pending) < self.concurrency:
+                schedule()
+            while pending:
+                ids, task = pending.popleft()
                 try:
-                    messages = await bot.get_messages(chat, ids)
-                except FloodWait as e:
-                    await asyncio.sleep(e.value)
-                    messages = await bot.get_messages(chat, ids)
+                    messages = await task
                 except Exception as e:
-                    errors += len(ids)
-                    current += BATCH_SIZE
+                    messages = e
+                if current <= last_id:
+                    schedule()
+                yield ids, messages
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+# =================================================
+# ⚙️ MAIN INDEXING LOGIC
+# =================================================
+async def index_files_to_db(job, bot, resumed=False):
+    job_id = job["_id"]
+    chat = job["chat_id"]
+    lst_msg_id = job["last_msg_id"]
+    target_db = job["target_db"]
+    resume_from = job["checkpoint"]
+    counters = dict(job.get("counters") or {})
+    for key in ("saved", "duplicate", "deleted", "no_media", "errors"):
+        counters.setdefault(key, 0)
+
+    start_time = time.time()
+    scanned = 0
+    last_edit = 0
+    db_label = "🔞 Brazzers" if target_db == "brazzers" else "🎬 Video"
+    pipeline = FetchPipeline(bot, chat)
+    btn = InlineKeyboardMarkup([[InlineKeyboardButton('CANCEL', callback_data=f'index#stop#{job_id}')]])
+
+    # Picked up again after a restart
+    if resumed:
+        await edit_job_status(bot, job, f"<b>🔁 {db_label} Indexing resumed from ID: {resume_from}...</b>", btn)
+
+    try:
+        async with aclosing(pipeline.batches(resume_from + 1, lst_msg_id)) as batches:
+            async for ids, messages in batches:
+
+                if index_queue.is_cancelled(job_id):
+                    time_taken = get_readable_time(time.time()-start_time)
+                    await edit_job_status(
+                        bot, job,
+                        f"🛑 Indexing Cancelled!\n⏱ Time: {time_taken}\n"
+                        f"✅ Saved: {counters['saved']}\n⏭ Stopped at ID: <code>{ids[0] - 1}</code>"
+                    )
+                    return
+
+                scanned = ids[-1] - resume_from
+                if isinstance(messages, Exception):
+                    counters["errors"] += len(ids)
+                    await db.index_job_store.save_checkpoint(job_id, ids[-1], counters)
                     continue
 
+                # Collect the whole batch, then save it with one bulk write
+                batch = []
                 for message in messages:
-                    if temp.CANCEL: break
-                    
                     try:
                         if not message or message.empty:
-                            deleted += 1
+                            counters["deleted"] += 1
                             continue
-                        
+
                         if not message.media:
-                            no_media += 1
+                            counters["no_media"] += 1
                             continue
-                        
+
                         if message.media not in [enums.MessageMediaType.VIDEO, enums.MessageMediaType.DOCUMENT]:
-                            unsupported += 1
+                            counters["no_media"] += 1
                             continue
-                        
+
                         media = getattr(message, message.media.value, None)
                         if not media:
-                            unsupported += 1
+                            counters["no_media"] += 1
                             continue
-                        
-                        file_id = media.file_id
-                        file_unique_id = media.file_unique_id
-                        
-                        # --- DB SELECTION LOGIC ---
+
+                        batch.append((media.file_unique_id, media.file_id))
+
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        counters["errors"] += 1
+
+                # --- DB SELECTION LOGIC ---
+                if batch:
+                    try:
                         if target_db == "brazzers":
-                            is_new = await db.add_brazzers_video(file_unique_id, file_id)
-                            # Handle None return if your DB function doesn't return bool
-                            if is_new is None: is_new = True 
+                            results = await db.add_brazzers_bulk(batch)
                         else:
-                            is_new = await db.add_video(file_unique_id, file_id)
-                        
-                        if is_new:
-                            total_files += 1
+                            results = await db.add_videos_bulk(batch)
+                    except Exception as e:
+                        print(f"Bulk Insert Error: {e}")
+                        results = [None] * len(batch)
+
+                    for is_new in results:
+                        if is_new is None:
+                            counters["errors"] += 1
+                        elif is_new:
+                            counters["saved"] += 1
                         else:
-                            duplicate += 1
+                            counters["duplicate"] += 1
 
-                    except Exception as e:
-                        print(f"Error: {e}")
-                        errors += 1
+                # Checkpoint after every batch -> a restart re-scans at most one batch
+                await db.index_job_store.save_checkpoint(job_id, ids[-1], counters)
+
+                # Live Update (throttled, edits are rate limited too)
+                if time.time() - last_edit < PROGRESS_INTERVAL:
+                    continue
+                last_edit = time.time()
 
-                # Update Progress
-                current += BATCH_SIZE
-                
-                # Live Update
-                percentage = (min(current, lst_msg_id) / lst_msg_id) * 100
+                percentage = (ids[-1] / lst_msg_id) * 100
                 prog_bar = get_progress_bar(percentage)
-                elapsed_time = get_readable_time(time.time() - start_time)
-                
-                db_label = "🔞 Brazzers" if target_db == "brazzers" else "🎬 Video"
+                elapsed = time.time() - start_time
+                speed = scanned / elapsed if elapsed else 0
 
-                btn = [[InlineKeyboardButton('CANCEL', callback_data=f'index#cancel')]]
-                
-                try:
-                    await msg.edit(
-                        f"📊 <b>{db_label} Indexing Progress</b>\n"
-                        f"{prog_bar} {percentage:.1f}%\n"
-                        f"━━━━━━━━━━━━━━━━\n"
-                        f"📥 Scanned: <code>{min(current, lst_msg_id)}/{lst_msg_id}</code>\n"
-                        f"✅ Saved: <code>{total_files}</code>\n"
-                        f"♻️ Duplicates: <code>{duplicate}</code>\n"
-                        f"🗑 Deleted/Skip: <code>{deleted + no_media + unsupported}</code>\n"
-                        f"⚠️ Errors: <code>{errors}</code>\n"
-                        f"⏱ Elapsed: <code>{elapsed_time}</code>",
-                        reply_markup=InlineKeyboardMarkup(btn)
-                    )
-                except FloodWait as e:
-                    await asyncio.sleep(e.value) 
-                except:
-                    pass
-
-            # Final Message
-            time_taken = get_readable_time(time.time()-start_time)
-            db_label = "🔞 Brazzers" if target_db == "brazzers" else "🎬 Video"
-            
-            await msg.edit(
-                f"✅ <b>{db_label} Indexing Completed!</b>\n"
-                f"⏱ Time: {time_taken}\n"
-                f"📥 Total Scanned: <code>{lst_msg_id}</code>\n"
-                f"✅ Saved: <code>{total_files}</code>\n"
-                f"♻️ Duplicates: <code>{duplicate}</code>\n"
-                f"🗑 Deleted: <code>{deleted}</code>\n"
-                f"🚫 Non-Media: <code>{no_media + unsupported}</code>\n"
-                f"⚠️ Errors: <code>{errors}</code>"
-            )
-
-        except Exception as e:
-            await msg.edit(f"❌ Critical Error: {e}")
-    
+                await edit_job_status(
+                    bot, job,
+                    f"📊 <b>{db_label} Indexing Progress</b>\n"
+                    f"{prog_bar} {percentage:.1f}%\n"
+                    f"━━━━━━━━━━━━━━━━\n"
+                    f"📥 Scanned: <code>{ids[-1]}/{lst_msg_id}</code>\n"
+                    f"⚡ Speed: <code>{speed:.1f} msg/s</code>\n"
+                    f"✅ Saved: <code>{counters['saved']}</code>\n"
+                    f"♻️ Duplicates: <code>{counters['duplicate']}</code>\n"
+                    f"🗑 Deleted/Skip: <code>{counters['deleted'] + counters['no_media']}</code>\n"
+                    f"⚠️ Errors: <code>{counters['errors']}</code>\n"
+                    f"⏱ Elapsed: <code>{get_readable_time(elapsed)}</code>",
+                    btn
+                )
+
+        await db.index_job_store.set_status(job_id, "done")
+
+        # A full scan of a source channel also moves its catch-up baseline
+        if chat in (VIDEO_CHANNEL, BRAZZER_CHANNEL):
+            await db.update_channel_hwm(chat, lst_msg_id)
+
+        # Final Message
+        elapsed = time.time() - start_time
+        speed = scanned / elapsed if elapsed else 0
+
+        await edit_job_status(
+            bot, job,
+            f"✅ <b>{db_label} Indexing Completed!</b>\n"
+            f"⏱ Time: {get_readable_time(elapsed)}\n"
+            f"📥 Total Scanned: <code>{lst_msg_id}</code>\n"
+            f"⚡ Speed: <code>{speed:.1f} msg/s</code>\n"
+            f"✅ Saved: <code>{counters['saved']}</code>\n"
+            f"♻️ Duplicates: <code>{counters['duplicate']}</code>\n"
+            f"🗑 Deleted: <code>{counters['deleted']}</code>\n"
+            f"🚫 Non-Media: <code>{counters['no_media']}</code>\n"
+            f"⚠️ Errors: <code>{counters['errors']}</code>"
+        )
+
+    except PyMongoError as e:
+        # Temporary DB error: stays "running", the queue resumes it from the checkpoint
+        await edit_job_status(bot, job, f"⚠️ Database error, indexing will resume: {e}", btn)
+        raise
+    except Exception as e:
+        await db.index_job_store.set_status(job_id, "failed")
+        await edit_job_status(bot, job, f"❌ Critical Error: {e}")
+
+index_queue = JobQueue(db.index_job_store, index_files_to_db, "Index")
+
+def start_index_worker(bot):
+    index_queue.start(bot)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from pyrogram.errors import FloodWait
+from pymongo.errors import PyMongoError
+
+# Logger Setup
+logger = logging.getLogger(__name__)
+
+# Seconds to wait after a database error before the queue tries again
+RETRY_DELAY = 30
+
+
+# =================================================
+# 🗂 PERSISTENT JOB QUEUE (index + broadcast jobs)
+# =================================================
+class JobQueue:
+    """
+    Runs the jobs of a JobStore one at a time through
+    `runner(job, bot, resumed)`. Interrupted jobs (status still "running"
+    after a restart, or after a database error) come first and resume from
+    their checkpoint; any other runner exception marks the job failed.
+    """
+
+    def __init__(self, store, runner, name):
+        self.store = store
+        self.runner = runner
+        self.name = name
+        self._wake = asyncio.Event()
+        self._cancelled = set()
+        self._worker = None
+
+    def start(self, bot):
+        if not self._worker or self._worker.done():
+            self._worker = asyncio.create_task(self._run(bot))
+
+    def wake(self):
+        self._wake.set()
+
+    async def cancel(self, job_id):
+        """Cancel a queued / running job; False if it already finished."""
+        if not await self.store.set_status(job_id, "cancelled"):
+            return False
+        self._cancelled.add(str(job_id))
+        return True
+
+    def is_cancelled(self, job_id):
+        return str(job_id) in self._cancelled
+
+    async def _run(self, bot):
+        while True:
+            self._wake.clear()
+            try:
+                jobs = await self.store.get_pending()
+                for job in jobs:
+                    await self._run_job(bot, job["_id"])
+            except Exception as e:
+                # Temporary DB error: jobs keep their status and are picked up again
+                logger.error(f"{self.name} queue error, retrying in {RETRY_DELAY}s: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+
+            if not jobs:
+                await self._wake.wait()
+
+    async def _run_job(self, bot, job_id):
+        # Re-read: it may have been cancelled while waiting in the queue
+        job = await self.store.get(job_id)
+        resumed = bool(job) and job["status"] == "running"
+        if not job or not await self.store.set_status(job_id, "running"):
+            self._cancelled.discard(str(job_id))
+            return
+        try:
+            await self.runner(job, bot, resumed)
+        except PyMongoError:
+            # Left "running" -> resumed from its last checkpoint
+            raise
+        except Exception as e:
+            logger.error(f"{self.name} job {job_id} crashed: {e}")
+            await self.store.set_status(job_id, "failed")
+        finally:
+            self._cancelled.discard(str(job_id))
+
+
+async def edit_job_status(bot, job, text, reply_markup=None):
+    """Edit the job's status message (it may be gone, edits are best effort)."""
+    try:
+        await bot.edit_message_text(
+            job["status_chat"], job["status_msg"], text, reply_markup=reply_markup
+        )
+    except FloodWait as e:
+        await asyncio.sleep(e.value)
+    except Exception:
+        pass
@@ -1,8 +1,13 @@
+import logging
+from contextlib import aclosing
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from info import VIDEO_CHANNEL, BRAZZER_CHANNEL, NO_IMG, POST_CHANNEL, POST_SHORTLINK, SEND_POST
+from info import VIDEO_CHANNEL, BRAZZER_CHANNEL, NO_IMG, POST_CHANNEL, POST_SHORTLINK, SEND_POST, LOG_CHANNEL
 from database.users_db import db
 from utils import temp, get_shortlink, generate_weird_name, generate_thumbnail
+from plugins.index import FetchPipeline
+
+logger = logging.getLogger(__name__)
 
 # -----------------------
 # BRAZZERS INDEX
@@ -11,7 +16,10 @@ from utils import temp, get_shortlink, generate_weird_name, generate_thumbnail
 async def index_brazzers_videos(_, m: Message):
     file_id = m.video.file_id
     file_unique_id = m.video.file_unique_id
-    await db.add_brazzers_video(file_unique_id, file_id)
+    try:
+        await db.queue_brazzers_video(file_unique_id, file_id, m.chat.id, m.id)
+    except Exception as e:
+        print(f"❌ Error in Brazzers Auto Index: {e}")
 
 # -----------------------
 # NORMAL VIDEO INDEX
@@ -25,8 +33,8 @@ async def index_normal_videos(client, m: Message):
         # 🔥 Weird random name
         file_name = generate_weird_name() + ".mp4"
 
-        # DB
-        status = await db.add_video(file_unique_id, file_id)
+        # DB (buffered: a burst of uploads becomes one bulk write)
+        status = await db.queue_video(file_unique_id, file_id, m.chat.id, m.id)
 
         if status:
             print(f"✅ New Video Added: {file_name} (Msg ID: {m.id})")
@@ -111,3 +119,78 @@ async def index_normal_videos(client, m: Message):
 
     except Exception as e:
         print(f"❌ Error in Auto Index: {e}")
+
+
+# -----------------------
+# CATCH-UP AFTER DOWNTIME
+# -----------------------
+# Consecutive empty id ranges after which we assume the channel's end is reached
+EMPTY_WINDOWS_TO_STOP = 2
+
+async def catch_up_channel(bot, chat_id, target_db):
+    """
+    Index every video posted after the channel's stored high-water mark
+    (i.e. while the bot was offline). Posts to POST_CHANNEL are not sent.
+    """
+    hwm = await db.get_channel_hwm(chat_id)
+    if hwm is None:
+        # No baseline yet: the first live post (or a /index run) sets it
+        return 0
+
+    pipeline = FetchPipeline(bot, chat_id)
+    window = pipeline.batch_size * pipeline.concurrency
+    current = hwm + 1
+    empty_windows = 0
+    saved = 0
+
+    while empty_windows < EMPTY_WINDOWS_TO_STOP:
+        found = False
+        async with aclosing(pipeline.batches(current, current + window - 1)) as batches:
+            async for ids, messages in batches:
+                if isinstance(messages, Exception):
+                    logger.error(f"Catch-up fetch failed for {chat_id}: {messages}")
+                    return saved
+
+                batch = []
+                for message in messages:
+                    if not message or message.empty:
+                        continue
+                    found = True
+                    hwm = max(hwm, message.id)
+                    if message.video:
+                        batch.append((message.video.file_unique_id, message.video.file_id))
+
+                if batch:
+                    if target_db == "brazzers":
+                        results = await db.add_brazzers_bulk(batch)
+                    else:
+                        results = await db.add_videos_bulk(batch)
+                    saved += sum(1 for r in results if r)
+
+        await db.update_channel_hwm(chat_id, hwm)
+        empty_windows = 0 if found else empty_windows + 1
+        current += window
+
+    return saved
+
+async def catch_up_channels(bot):
+    summary = []
+    for chat_id, target_db in ((VIDEO_CHANNEL, "main"), (BRAZZER_CHANNEL, "brazzers")):
+        if not chat_id:
+            continue
+        try:
+            saved = await catch_up_channel(bot, chat_id, target_db)
+        except Exception as e:
+            logger.error(f"Catch-up failed for {chat_id}: {e}")
+            continue
+        if saved:
+            summary.append(f"✅ <code>{chat_id}</code>: {saved} new video(s)")
+
+    if summary:
+        try:
+            await bot.send_message(
+                LOG_CHANNEL,
+                "<b>🔁 Catch-up Indexing Completed</b>\n\n" + "\n".join(summary)
+            )
+        except Exception:
+            pass
@@ -1,3 +1,4 @@
+import html
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from Script import script
@@ -5,58 +6,87 @@ from database.users_db import db
 from info import VERIFICATION_DAILY_LIMIT, DAILY_LIMIT, PREMIUM_DAILY_LIMIT, ADMINS, LOG_CHANNEL, PREMIUM_LOGS, OWNER_USERNAME, UPI_ID, QR_CODE_IMAGE
 from datetime import timedelta
 import pytz, datetime, time, asyncio
-from pyrogram.errors.exceptions.bad_request_400 import MessageTooLong
 from utils import temp, get_seconds
+from plugins.request_context import BUY, MY_PLAN, get_context
 
 # -------------------------------------------------------------------------
 # 📋 ADMIN: LIST PREMIUM USERS
 # -------------------------------------------------------------------------
+PREMIUM_PAGE_SIZE = 20
+
+async def resolve_names(client, users):
+    """Names for users stored without one, via get_users batches of up to 200 ids."""
+    missing = [u["id"] for u in users if not (u.get("name") or u.get("username"))]
+    names = {}
+    for i in range(0, len(missing), 200):
+        try:
+            for tg_user in await client.get_users(missing[i:i + 200]):
+                names[tg_user.id] = tg_user.first_name
+        except Exception as e:
+            print(f"[PREMIUM LIST] get_users failed: {e}")
+    return names
+
+async def build_premium_page(client, page):
+    total = await db.premium_users_count()
+    pages = max(1, -(-total // PREMIUM_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    users = await db.get_premium_users(page * PREMIUM_PAGE_SIZE, PREMIUM_PAGE_SIZE)
+    names = await resolve_names(client, users)
+
+    ist = pytz.timezone("Asia/Kolkata")
+    current_time = datetime.datetime.now(ist)
+    lines = []
+    for number, user in enumerate(users, start=page * PREMIUM_PAGE_SIZE + 1):
+        user_id = user["id"]
+        expiry = user["expiry_time"]
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=datetime.timezone.utc)
+        expiry_ist = expiry.astimezone(ist)
+        time_left = expiry_ist - current_time
+        days, remainder = divmod(time_left.total_seconds(), 86400)
+        hours, remainder = divmod(remainder, 3600)
+        minutes, _ = divmod(remainder, 60)
+        name = user.get("name") or user.get("username") or names.get(user_id) or user_id
+        lines.append(
+            f"{number}. User ID: {user_id}\n"
+            f"Name: <a href='tg://user?id={user_id}'>{html.escape(str(name))}</a>\n"
+            f"Expiry Date: {expiry_ist.strftime('%d-%m-%Y %I:%M:%S %p')}\n"
+            f"Expiry Time: {int(days)} days, {int(hours)} hours, {int(minutes)} minutes\n"
+        )
+
+    text = f"Paid Users - {total} (Page {page + 1}/{pages})\n\n" + ("\n".join(lines) or "No active paid users.")
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ Back", callback_data=f"premium_page#{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"premium_page#{page + 1}"))
+    buttons = [nav] if nav else []
+    buttons.append([InlineKeyboardButton('✖️ ᴄʟᴏsᴇ ✖️', callback_data='close_data')])
+    return text, InlineKeyboardMarkup(buttons)
+
 @Client.on_message(filters.command("premium_user") & filters.user(ADMINS))
 async def premium_user(client, message):
-    aa = await message.reply_text("Fetching ...")  
-    users = await db.get_all_users()
-    users_list = []
-    async for user in users:
-        users_list.append(user)    
-    user_data = {user['id']: await db.get_user(user['id']) for user in users_list}    
-    new_users = []
-    for user in users_list:
-        user_id = user['id']
-        data = user_data.get(user_id)
-        expiry = data.get("expiry_time") if data else None        
-        if expiry:
-            expiry_ist = expiry.astimezone(pytz.timezone("Asia/Kolkata"))
-            expiry_str_in_ist = expiry_ist.strftime("%d-%m-%Y %I:%M:%S %p")          
-            current_time = datetime.datetime.now(pytz.timezone("Asia/Kolkata"))
-            time_left = expiry_ist - current_time
-            days, remainder = divmod(time_left.total_seconds(), 86400)
-            hours, remainder = divmod(remainder, 3600)
-            minutes, _ = divmod(remainder, 60)            
-            time_left_str = f"{int(days)} days, {int(hours)} hours, {int(minutes)} minutes"            
-            user_info = await client.get_users(user_id)
-            user_str = (
-                f"{len(new_users) + 1}. User ID: {user_id}\n"
-                f"Name: {user_info.mention}\n"
-                f"Expiry Date: {expiry_str_in_ist}\n"
-                f"Expiry Time: {time_left_str}\n\n"
-            )
-            new_users.append(user_str)
-    new = "Paid Users - \n\n" + "\n".join(new_users)   
-    try:
-        await aa.edit_text(new)
-    except MessageTooLong:
-        with open('usersplan.txt', 'w+') as outfile:
-            outfile.write(new)
-        await message.reply_document('usersplan.txt', caption="Paid Users:")
+    aa = await message.reply_text("Fetching ...")
+    text, markup = await build_premium_page(client, 0)
+    await aa.edit_text(text, reply_markup=markup, disable_web_page_preview=True)
+
+# Group -1: command.py's catch-all cb_handler (group 0) loads first and would take it
+@Client.on_callback_query(filters.regex(r"^premium_page#") & filters.user(ADMINS), group=-1)
+async def premium_user_page(client, callback_query: CallbackQuery):
+    page = int(callback_query.data.split("#")[1])
+    text, markup = await build_premium_page(client, page)
+    await callback_query.message.edit_text(text, reply_markup=markup, disable_web_page_preview=True)
+    await callback_query.answer()
+    callback_query.stop_propagation()
 
 # -------------------------------------------------------------------------
 # 🛍️ BUY COMMAND (Shows Plan & QR Code)
 # -------------------------------------------------------------------------
-@Client.on_message(filters.command("buy") | filters.regex(r"(?i)Subscription"))
+@Client.on_message(BUY)
 async def buy_handler(client, message: Message):
     user_id = message.from_user.id
     username = message.from_user.first_name
-    is_premium = await db.has_premium_access(user_id)
+    is_premium = (await get_context(message)).is_premium
     user_username = f"@{message.from_user.username}" if message.from_user.username else "No Username"
     log_text = (
         f"#Buy_Command_Used\n\n"
@@ -163,14 +193,15 @@ async def reject_payment(client, callback_query: CallbackQuery):
 # -------------------------------------------------------------------------
 # 👤 MY PLAN COMMAND
 # -------------------------------------------------------------------------
-@Client.on_message((filters.command("myplan") | filters.regex(r"(?i)^my\s?plan$")) & filters.private)
+@Client.on_message(MY_PLAN)
 async def myplan_handler(_, m: Message):
     user_id = m.from_user.id
     username = m.from_user.first_name
 
-    used = await db.get_video_count(user_id)
-    is_premium = await db.has_premium_access(user_id)
-    is_verified = await db.is_user_verified(user_id)
+    ctx = await get_context(m)
+    used = ctx.used
+    is_premium = ctx.is_premium
+    is_verified = ctx.is_verified
 
     # -------- LIMIT LOGIC --------
     if is_premium:
@@ -185,7 +216,7 @@ async def myplan_handler(_, m: Message):
 
     remaining = max(daily_limit - used, 0)
 
-    premium_details = await db.get_user(user_id) if is_premium else None
+    premium_details = ctx.user if is_premium else None
 
     # -------- SAME STYLE TEXT --------
     text = f"""📊 <blockquote>**𝖯𝗅𝖺𝗇 𝖣𝖾𝗍𝖺𝗂𝗅𝗌**</blockquote>
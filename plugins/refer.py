@@ -1,15 +1,16 @@
-from pyrogram import Client, filters, enums
+from pyrogram import Client, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.users_db import db
 from utils import temp
 from Script import script
 import datetime
 from info import PREMIUM_LOGS
+from plugins.request_context import REFER, get_context
 
-@Client.on_message(filters.command(["invite", "refer"]))
+@Client.on_message(REFER)
 async def invite_command_handler(client, message):
     user_id = message.from_user.id
-    is_premium = await db.has_premium_access(user_id)
+    is_premium = (await get_context(message)).is_premium
     ref_link = f"https://t.me/{temp.U_NAME}?start=reff_{user_id}"
     share_link = f"https://telegram.me/share/url?url={ref_link}&text=Join%20Now%20For%20Movies!"
     if is_premium:
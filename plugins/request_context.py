@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timezone
+from pyrogram import Client, filters
+from pyrogram.types import Message
+from database.users_db import db, video_count_today, verified_from_doc
+from info import FSUB, DAILY_LIMIT, VERIFICATION_DAILY_LIMIT, PREMIUM_DAILY_LIMIT
+from plugins.ban_manager import ban_manager
+from utils import is_user_joined
+
+# =================================================
+# 🎯 USER REQUEST FILTERS (shared with the handlers)
+# =================================================
+START = filters.command("start") & filters.private
+GET_VIDEO = filters.command("getvideo") | filters.regex(r"(?i)get video")
+BRAZZERS = filters.command("brazzers") | filters.regex(r"(?i)brazzers")
+MY_PLAN = (filters.command("myplan") | filters.regex(r"(?i)^my\s?plan$")) & filters.private
+BUY = filters.command("buy") | filters.regex(r"(?i)Subscription")
+REDEEM = filters.command("redeem")
+REDEEM_CODE = filters.regex(r"^PWZONE[A-Z0-9]{10}$")
+REFER = filters.command(["invite", "refer"])
+
+FSUB_GATED = START | GET_VIDEO | BRAZZERS
+BAN_GATED = GET_VIDEO | BRAZZERS
+NEEDS_CONTEXT = GET_VIDEO | BRAZZERS | MY_PLAN | BUY | REDEEM | REDEEM_CODE | REFER
+
+
+# =================================================
+# 📦 REQUEST CONTEXT
+# =================================================
+class RequestContext:
+    """Everything the user-facing handlers need about the sender, resolved once."""
+
+    def __init__(self, user_id, user, is_verified, used):
+        self.user_id = user_id
+        self.user = user or {}
+        self.expiry_time = self.user.get("expiry_time")
+        self.is_premium = user_premium(self.user)
+        self.is_verified = is_verified
+        self.used = used
+
+        if self.is_premium:
+            self.plan, self.daily_limit = "Paid", PREMIUM_DAILY_LIMIT
+        elif is_verified:
+            self.plan, self.daily_limit = "Verified", VERIFICATION_DAILY_LIMIT
+        else:
+            self.plan, self.daily_limit = "Free", DAILY_LIMIT
+        self.remaining = max(self.daily_limit - used, 0)
+
+def user_premium(user):
+    """Same rule as db.has_premium_access(), on an already loaded user doc."""
+    expiry = user.get("expiry_time")
+    if not isinstance(expiry, datetime):
+        return False
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) <= expiry
+
+async def build_context(user_id):
+    # One `users` read (plan + today's count) and one read-only `misc` lookup
+    user, verify = await asyncio.gather(
+        db.get_user(user_id),
+        db.get_verify_doc(user_id),
+    )
+    return RequestContext(user_id, user, verified_from_doc(verify), video_count_today(user))
+
+async def get_context(message: Message) -> RequestContext:
+    """Context attached by the middleware, or built now (direct calls)."""
+    ctx = getattr(message, "ctx", None)
+    if ctx is None:
+        ctx = await build_context(message.from_user.id)
+        message.ctx = ctx
+    return ctx
+
+
+# =================================================
+# 🚦 MIDDLEWARE (group -1 runs before every plugin handler)
+# =================================================
+@Client.on_message(NEEDS_CONTEXT | FSUB_GATED, group=-1)
+async def request_middleware(client, message: Message):
+    if not message.from_user:
+        return
+
+    # Force subscribe
+    if FSUB and await FSUB_GATED(client, message) and not await is_user_joined(client, message):
+        message.stop_propagation()
+
+    # Ban / flood check
+    if await BAN_GATED(client, message) and await ban_manager.check_ban(client, message):
+        message.stop_propagation()
+
+    if await NEEDS_CONTEXT(client, message):
+        message.ctx = await build_context(message.from_user.id)
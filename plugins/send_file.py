@@ -1,4 +1,3 @@
-import asyncio
 from database.users_db import db
 from utils import temp, auto_delete_message
 
@@ -15,7 +14,7 @@ async def send_requested_file(client, message, user_id, search_id):
                 f"<blockquote>ᴛʜɪꜱ ꜰɪʟᴇ ᴡɪʟʟ ʙᴇ ᴀᴜᴛᴏ ᴅᴇʟᴇᴛᴇ ᴀꜰᴛᴇʀ 10 ᴍɪɴᴜᴛᴇꜱ. ᴘʟᴇᴀꜱᴇ ꜰᴏʀᴡᴀʀᴅ ᴛʜɪꜱ ꜰɪʟᴇ ꜱᴏᴍᴇᴡʜᴇʀᴇ ᴇʟꜱᴇ ᴏʀ ꜱᴀᴠᴇ ɪɴ ꜱᴀᴠᴇᴅ ᴍᴇꜱꜱᴀɢᴇꜱ.</blockquote>"
             )
         )
-        asyncio.create_task(auto_delete_message(message, dlt))
+        await auto_delete_message(message, dlt)
 
     except Exception as e:
         print(f"❌ Error sending file: {e}")
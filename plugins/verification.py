@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import random
 import string
@@ -61,7 +60,7 @@ async def av_x_verification(client, message):
         reply_markup=InlineKeyboardMarkup(buttons),
         parse_mode=enums.ParseMode.HTML
     )
-    asyncio.create_task(auto_delete_message(message, dlt))
+    await auto_delete_message(message, dlt)
     return False
 
 # --- VERIFICATION SUCCESS HANDLER (Run on /start) ---
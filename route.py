@@ -1,4 +1,3 @@
-import os
 import logging
 import traceback
 import asyncio
@@ -10,13 +9,11 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # Import your database and config
 from database.users_db import db
+from utils import ReportWriter
 from info import (
     PREMIUM_LOGS, 
     LOG_CHANNEL, 
-    PREMIUM_DAILY_LIMIT, 
-    DAILY_LIMIT,
-    WEB_APP_URL,
-    VERIFICATION_DAILY_LIMIT
+    WEB_APP_URL
 )
 
 routes = web.RouteTableDef()
@@ -69,8 +66,7 @@ async def check_expired_premium(client):
                 await db.remove_premium_access(user_id)
 
                 # Unset reminder flags in DB
-                unset_flags = {f"reminder_{label}_sent": "" for label, _ in REMINDER_TIMES}
-                await db.users.update_one({"id": user_id}, {"$unset": unset_flags})
+                await db.clear_reminder_flags(user_id, [label for label, _ in REMINDER_TIMES])
 
                 # Notify User & Log
                 try:
@@ -118,37 +114,28 @@ async def check_expired_premium(client):
 async def auto_daily_report(client):
     print("⏰ Sending Daily Auto Report...")
 
-    users_cursor = db.users.find({})
-    report_list = []
+    today_date = datetime.now(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y")
+
+    # Rows stream into an in-memory file; only the first 10 stay in a list
+    report = ReportWriter(
+        f"Daily_Report_{today_date}.txt",
+        header=f"📊 DAILY USAGE REPORT - {today_date}\n=================================\n\n",
+        preview=10
+    )
     total_files_used = 0
     active_users_count = 0
 
-    async for user in users_cursor:
-        user_id = user.get("id", "N/A")
-        username = user.get("username")
-        username_display = f"@{username}" if username else "N/A"
+    # One server-side aggregation: plan + limit are computed by MongoDB
 
-        # -------- USAGE --------
-        used = await db.get_video_count(user_id) or 0
-        if used == 0:
-            continue
-
-        # -------- STATUS CHECK --------
-        is_premium = await db.has_premium_access(user_id)
-        is_verified = await db.is_user_verified(user_id)
-
-        # -------- LIMIT LOGIC --------
-        if is_premium:
-            daily_limit = PREMIUM_DAILY_LIMIT
-            subscription_type = "Paid"
-        elif is_verified:
-            daily_limit = VERIFICATION_DAILY_LIMIT
-            subscription_type = "Verified"
-        else:
-            daily_limit = DAILY_LIMIT
-            subscription_type = "Free"
+    async for row in db.daily_usage_report():
+        user_id = row.get("user_id", "N/A")
+        username = row.get("username")
+        username_display = f"@{username}" if username else "N/A"
 
-        remaining = max(daily_limit - used, 0)
+        used = row["used"]
+        daily_limit = row["daily_limit"]
+        subscription_type = row["plan"]
+        remaining = row["remaining"]
 
         total_files_used += used
 
@@ -159,12 +146,10 @@ async def auto_daily_report(client):
             f"╰ 📁 Limit: {daily_limit} | Used: {used} | Left: {remaining}"
         )
 
-        report_list.append(user_entry)
+        report.add_row(user_entry, separator="\n\n---------------------------------\n\n")
         active_users_count += 1
 
     # -------- REPORT SUMMARY --------
-    today_date = datetime.now(pytz.timezone("Asia/Kolkata")).strftime("%d-%m-%Y")
-
     summary_text = (
         f"📅 **Date:** {today_date}\n"
         f"🧾 **Active Users:** `{active_users_count}`\n"
@@ -175,34 +160,24 @@ async def auto_daily_report(client):
 
     # -------- SEND REPORT --------
     if active_users_count > 10:
-        file_path = f"Daily_Report_{today_date}.txt"
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(f"📊 DAILY USAGE REPORT - {today_date}\n")
-            f.write("=================================\n\n")
-            f.write("\n\n---------------------------------\n\n".join(report_list))
-            f.write("\n\n=================================\n")
-            f.write(f"Total Active Users: {active_users_count}\n")
-            f.write(f"Total Files Used: {total_files_used}")
+        report.write("=================================\n")
+        report.write(f"Total Active Users: {active_users_count}\n")
+        report.write(f"Total Files Used: {total_files_used}")
 
         try:
-            await client.send_document(
-                chat_id=chat_id,
-                document=file_path,
+            await report.send(
+                client, chat_id,
                 caption=f"📊 **Daily Auto Report** 🌙\n\n{summary_text}\n\nℹ️ _Full details in file._"
             )
         except Exception as e:
             print(f"Failed to send auto report document: {e}")
 
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
     else:
         if active_users_count == 0:
             final_msg = f"📊 **Daily Report ({today_date})**\n\n❌ No active usage today."
         else:
             formatted_entries = []
-            for entry in report_list:
+            for entry in report.preview:
                 entry = entry.replace("User:", "**User:**").replace("Plan:", "`Plan:`")
                 formatted_entries.append(entry)
 
@@ -1,14 +1,21 @@
+import io
+import gzip
 import asyncio
 import time
 import math
+from collections import defaultdict
 import logging
 import aiohttp
 from shortzy import Shortzy  # Ensure pip install shortzy
 import os, uuid, subprocess
 import random, string
 # --- FIX: Added AUTH_CHANNEL, AUTH_PICS to imports ---
-from info import SHORTLINK_API, SHORTLINK_URL, POST_SHORTLINK_API, POST_SHORTLINK_URL, AUTH_CHANNEL, AUTH_PICS
+from info import (
+    SHORTLINK_API, SHORTLINK_URL, POST_SHORTLINK_API, POST_SHORTLINK_URL, AUTH_CHANNEL, AUTH_PICS, EXPORT_GZIP,
+    USER_CACHE_SIZE, FSUB_MEMBER_TTL, FSUB_NONMEMBER_TTL
+)
 from database.users_db import db
+from database.cache import TTLCache
 from pyrogram.enums import ParseMode
 from Script import script
 
@@ -34,7 +41,6 @@ class temp(object):
     B_NAME = None
     B_LINK = None
     BOT = None
-    USERS_CANCEL = False
     CANCEL = False  
     START_TIME = 0  
     CURRENT = 0    
@@ -42,46 +48,73 @@ class temp(object):
 # =================================================
 # 📢 FORCE SUBSCRIBE CHECK (Updated)
 # =================================================
+# Membership answers per (channel, user); "joined" is kept much longer than
+# "not joined" so Try Again works right after the user joins.
+FSUB_CACHE = TTLCache(USER_CACHE_SIZE * max(len(AUTH_CHANNEL), 1), FSUB_MEMBER_TTL)
+# channel_id -> (title, invite_link), fetched once: exporting a link each time
+# would also revoke the previous primary link
+CHANNEL_INFO_CACHE = TTLCache(100, 6 * 3600)
+_ADMIN_REQUIRED = object()
+
+async def _get_channel_info(bot, channel_id):
+    info = CHANNEL_INFO_CACHE.get(channel_id)
+    if info:
+        return info
+    chat = await bot.get_chat(channel_id)
+    invite_link = chat.invite_link or await bot.export_chat_invite_link(channel_id)
+    info = (chat.title, invite_link)
+    CHANNEL_INFO_CACHE.set(channel_id, info)
+    return info
+
+async def _check_channel(bot, channel_id, user_id):
+    """None = joined (or check not possible), else (title, link) / _ADMIN_REQUIRED."""
+    key = (channel_id, user_id)
+    joined = FSUB_CACHE.get(key)
+    if joined is None:
+        try:
+            await bot.get_chat_member(channel_id, user_id)
+            joined = True
+        except UserNotParticipant:
+            joined = False
+        except Exception:
+            # Agar koi aur error aaye (jaise bot kicked), to ignore karo
+            return None
+        FSUB_CACHE.set(key, joined, None if joined else FSUB_NONMEMBER_TTL)
+
+    if joined:
+        return None
+    try:
+        return await _get_channel_info(bot, channel_id)
+    except ChatAdminRequired:
+        return _ADMIN_REQUIRED
+    except Exception as e:
+        logger.error(f"[ERROR] Chat fetch failed: {e}")
+        return None
+
 async def is_user_joined(bot, message: Message) -> bool:
     # Agar AUTH_CHANNEL khali hai to check skip karo
     if not AUTH_CHANNEL:
         return True
 
     user_id = message.from_user.id    
-    not_joined_channels = []
-    
-    for channel_id in AUTH_CHANNEL:
-        try:
-            await bot.get_chat_member(channel_id, user_id)
-        except UserNotParticipant:
-            try:
-                chat = await bot.get_chat(channel_id)
-                try:
-                    invite_link = await bot.export_chat_invite_link(channel_id)
-                except ChatAdminRequired:
-                    # Agar bot admin nahi hai to user ko batao
-                    await message.reply_text(
-                        text = (
-                            "<i>🔒 Bᴏᴛ ɪs ɴᴏᴛ ᴀɴ ᴀᴅᴍɪɴ ɪɴ ᴛʜɪs ᴄʜᴀɴɴᴇʟ.\n"
-                            "Pʟᴇᴀsᴇ ᴄᴏɴᴛᴀᴄᴛ ᴛʜᴇ ᴅᴇᴠᴇʟᴏᴘᴇʀ:</i> "
-                            "<b><a href='https://t.me/AV_SUPPORT_GROUP'>[ ᴄʟɪᴄᴋ ʜᴇʀᴇ ]</a></b>"
-                        ),
-                        parse_mode=ParseMode.HTML,
-                        disable_web_page_preview=True
-                    )
-                    return False
-                except Exception as e:
-                    logger.error(f"Failed to export link: {e}")
-                    continue
-
-                not_joined_channels.append((chat.title, invite_link))
-            except Exception as e:
-                logger.error(f"[ERROR] Chat fetch failed: {e}")
-                continue
-        except Exception as e:
-            # Agar koi aur error aaye (jaise bot kicked), to ignore karo ya log karo
-            # logger.error(f"[ERROR] get_chat_member failed: {e}")
-            continue
+
+    # All channels are checked at the same time
+    results = await asyncio.gather(*(_check_channel(bot, channel_id, user_id) for channel_id in AUTH_CHANNEL))
+
+    if any(result is _ADMIN_REQUIRED for result in results):
+        # Agar bot admin nahi hai to user ko batao
+        await message.reply_text(
+            text = (
+                "<i>🔒 Bᴏᴛ ɪs ɴᴏᴛ ᴀɴ ᴀᴅᴍɪɴ ɪɴ ᴛʜɪs ᴄʜᴀɴɴᴇʟ.\n"
+                "Pʟᴇᴀsᴇ ᴄᴏɴᴛᴀᴄᴛ ᴛʜᴇ ᴅᴇᴠᴇʟᴏᴘᴇʀ:</i> "
+                "<b><a href='https://t.me/AV_SUPPORT_GROUP'>[ ᴄʟɪᴄᴋ ʜᴇʀᴇ ]</a></b>"
+            ),
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True
+        )
+        return False
+
+    not_joined_channels = [result for result in results if result]
 
     if not_joined_channels:
         buttons = [
@@ -215,28 +248,52 @@ def get_progress_bar(percent, length=10):
 # =================================================
 # 📢 BROADCAST FUNCTION
 # =================================================
-async def users_broadcast(user_id, message, is_pin):
+async def _drop_user(user_id, reason, pruner):
+    if pruner:
+        pruner.add(int(user_id), reason)   # flushed later in one delete_many
+    else:
+        await db.prune_users([(int(user_id), reason)])
+
+async def users_broadcast(user_id, message, is_pin, governor=None, pruner=None):
+    """
+    `governor` (plugins.broadcast_engine.RateGovernor) is asked for a token
+    before every API call and paused for everyone on FloodWait.
+    Dead users go to `pruner` (plugins.broadcast_engine.DeadUserPruner) when given.
+    """
     try:
-        m = await message.copy(chat_id=user_id)
+        while True:
+            try:
+                if governor:
+                    await governor.acquire()
+                m = await message.copy(chat_id=user_id)
+                break
+            except FloodWait as e:
+                # Retry in the loop (no recursion), after a global pause if shared
+                if governor:
+                    governor.pause(e.value)
+                else:
+                    await asyncio.sleep(e.value)
         if is_pin:
             try:
+                if governor:
+                    await governor.acquire()
                 await m.pin(both_sides=True)
+            except FloodWait as e:
+                if governor:
+                    governor.pause(e.value)
             except Exception:
                 pass 
         return True, "Success"
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await users_broadcast(user_id, message, is_pin)
     except InputUserDeactivated:
-        await db.delete_user(int(user_id))
+        await _drop_user(user_id, "deleted", pruner)
         logging.info(f"{user_id} - Removed from Database, since deleted account.")
         return False, "Deleted"
     except UserIsBlocked:
         logging.info(f"{user_id} - Blocked the bot.")
-        await db.delete_user(user_id)
+        await _drop_user(user_id, "blocked", pruner)
         return False, "Blocked"
     except PeerIdInvalid:
-        await db.delete_user(int(user_id))
+        await _drop_user(user_id, "peer_invalid", pruner)
         logging.info(f"{user_id} - PeerIdInvalid")
         return False, "Error"
     except Exception as e:
@@ -294,11 +351,90 @@ async def get_shortlink_av(url):
     return url
 
 # --- BACKGROUND DELETE HELPER ---
-async def auto_delete_message(message, dlt_msg):
-    await asyncio.sleep(600)
-    try:
-        await dlt_msg.delete()
-        await message.delete()
-    except Exception:
-        pass
+async def auto_delete_message(message, dlt_msg, delay=600):
+    """Queue both messages for deletion after `delay` seconds (stored in Mongo)."""
+    ids_by_chat = defaultdict(list)
+    for msg in (dlt_msg, message):
+        if msg and msg.chat:
+            ids_by_chat[msg.chat.id].append(msg.id)
+    for chat_id, message_ids in ids_by_chat.items():
+        await db.schedule_delete(chat_id, message_ids, delay)
+
+async def delete_queue_worker(client, interval=15, batch=1000):
+    """
+    Single loop for every pending auto delete: pulls due rows from
+    `delete_queue`, groups them per chat and deletes up to 100 ids per call.
+    Rows stay in Mongo until handled, so a restart loses nothing.
+    """
+    while True:
+        due = []
+        try:
+            due = await db.get_due_deletes(batch)
+            ids_by_chat = defaultdict(list)
+            for row in due:
+                ids_by_chat[row["chat_id"]].extend(row["message_ids"])
+
+            for chat_id, message_ids in ids_by_chat.items():
+                for i in range(0, len(message_ids), 100):
+                    chunk = message_ids[i:i + 100]
+                    while True:
+                        try:
+                            await client.delete_messages(chat_id, chunk)
+                            break
+                        except FloodWait as e:
+                            await asyncio.sleep(e.value)
+                        except Exception:
+                            # Already gone / chat not reachable anymore
+                            break
+
+            if due:
+                await db.remove_deletes([row["_id"] for row in due])
+        except Exception as e:
+            logger.error(f"Delete queue error: {e}")
+
+        # A full batch means more rows are already due
+        if len(due) < batch:
+            await asyncio.sleep(interval)
         
+
+# --- IN-MEMORY EXPORT WRITER ---
+class ReportWriter:
+    """
+    Admin export built row by row inside a BytesIO (gzip when EXPORT_GZIP),
+    so reports stream from a cursor and never touch the disk.
+    Only the first `preview` rows are also kept, for the short chat version
+    (`preview_text` when the chat shows a row differently from the file).
+    """
+
+    def __init__(self, filename, header="", preview=0, compress=EXPORT_GZIP):
+        self.filename = f"{filename}.gz" if compress else filename
+        self.preview_limit = preview
+        self.preview = []
+        self.rows = 0
+        self._buffer = io.BytesIO()
+        self._stream = gzip.GzipFile(fileobj=self._buffer, mode="wb") if compress else self._buffer
+        if header:
+            self.write(header)
+
+    def write(self, text):
+        self._stream.write(text.encode("utf-8"))
+
+    def add_row(self, text, separator="\n", preview_text=None):
+        if self.rows < self.preview_limit:
+            self.preview.append(text if preview_text is None else preview_text)
+        self.write(text + separator)
+        self.rows += 1
+
+    def getvalue(self):
+        """Finish the file and return it as a named BytesIO (Pyrogram uses `.name`)."""
+        if self._stream is not self._buffer and not self._stream.closed:
+            self._stream.close()
+        self._buffer.name = self.filename
+        self._buffer.seek(0)
+        return self._buffer
+
+    async def reply(self, message, caption=None):
+        return await message.reply_document(document=self.getvalue(), file_name=self.filename, caption=caption)
+
+    async def send(self, client, chat_id, caption=None):
+        return await client.send_document(chat_id, document=self.getvalue(), file_name=self.filename, caption=caption)